@@ -9,15 +9,39 @@ Authentication:
   All endpoints require:  Authorization: Bearer <RAILWAY_API_KEY>
 
 Designed to be triggered by n8n on a daily schedule.
+
+In production this runs under gunicorn (see Procfile / railway.toml) with
+threaded workers, so /health keeps answering while a run is in progress.
+`python server.py` starts the Flask dev server for local use.
+
+Each tools/*.py script exposes run(run_date, ...). The sheet steps import and
+call it directly, so they share one interpreter and one Sheets client. The
+long-running predictor steps (Playwright, Anthropic API) call it in a child
+Python process instead, so a step that overruns STEP_TIMEOUT can be killed
+rather than left running in the background.
+
+A step's status is "ok" when its run() returns status "ok", "error" when it
+returns anything else (e.g. a tool that wrote a failed-status output),
+"timeout" when it overruns STEP_TIMEOUT and "exception" when run() raises,
+whether in-process or in a child. See workflows/morning_run.md for what each
+means for a run.
 """
 
+import importlib
 import os
+import signal
 import subprocess
 import sys
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import date
 
 from dotenv import load_dotenv
 from flask import Flask, jsonify, request
+from playwright.sync_api import sync_playwright
 
 load_dotenv()
 
@@ -25,15 +49,36 @@ app = Flask(__name__)
 
 API_KEY = os.environ.get("RAILWAY_API_KEY")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TOOLS_DIR = os.path.join(BASE_DIR, "tools")
 PYTHON = sys.executable
-STEP_TIMEOUT = 300  # seconds per script — 5 minutes
+STEP_TIMEOUT = 300  # seconds per step — 5 minutes
+MAX_PARALLEL_PREDICTORS = 2  # all predictor steps are independent I/O-bound jobs
+OUTPUT_TAIL_LINES = 200  # per-step log lines kept for the JSON response
 
 
 # ---------------------------------------------------------------------------
-# Playwright browser install (Railway filesystem is ephemeral — runs on startup)
+# Playwright browser install (Railway filesystem is ephemeral — runs on startup,
+# but is skipped on restarts within a container that already has Chromium)
 # ---------------------------------------------------------------------------
 
+def playwright_browsers_installed():
+    """
+    True if the Chromium build the installed playwright version launches is
+    already on disk. Asking playwright for the path (rather than globbing for
+    any chromium-* dir) means a playwright upgrade still triggers an install.
+    """
+    try:
+        with sync_playwright() as p:
+            return os.path.exists(p.chromium.executable_path)
+    except Exception:
+        return False
+
+
 def install_playwright_browsers():
+    if playwright_browsers_installed():
+        print("[startup] Playwright browsers already installed — skipping.", flush=True)
+        return
+
     print("[startup] Installing Playwright browsers...", flush=True)
     result = subprocess.run(
         [PYTHON, "-m", "playwright", "install", "--with-deps", "chromium"],
@@ -49,6 +94,64 @@ def install_playwright_browsers():
 
 install_playwright_browsers()
 
+# Tools import each other by bare module name (e.g. `from update_sheet import ...`),
+# so import them the same way to share a single copy of every module.
+sys.path.insert(0, TOOLS_DIR)
+
+
+# ---------------------------------------------------------------------------
+# Per-step output capture
+# ---------------------------------------------------------------------------
+
+class OutputTail:
+    """
+    Write-only text sink that keeps just the last OUTPUT_TAIL_LINES lines, so a
+    chatty step costs O(1) memory and the response still shows the lines that
+    matter (the final error is almost always near the end).
+    """
+
+    def __init__(self, maxlen=OUTPUT_TAIL_LINES):
+        self._lines = deque(maxlen=maxlen)
+        self._partial = ""
+
+    def write(self, text):
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        self._lines.extend(lines)
+
+    def getvalue(self):
+        return "\n".join([*self._lines, self._partial])
+
+
+class ThreadOutputRouter:
+    """
+    sys.stdout / sys.stderr replacement that copies everything a thread prints
+    into that thread's capture buffer (if any), while still forwarding it to the
+    real stream so Railway logs show it live. contextlib.redirect_stdout can't be
+    used because morning steps run concurrently and it is process-global.
+    """
+
+    _local = threading.local()
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is not None:
+            buffer.write(text)
+        return self._stream.write(text)
+
+    def flush(self):
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+sys.stdout = ThreadOutputRouter(sys.stdout)
+sys.stderr = ThreadOutputRouter(sys.stderr)
+
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -64,41 +167,188 @@ def check_api_key():
     return None
 
 
-def run_step(cmd, label):
+def _call_tool(module_name, label, args, kwargs, outcome):
+    """Thread target: call tools/<module_name>.run() and record a result dict in outcome."""
+    buffer = OutputTail()
+    ThreadOutputRouter._local.buffer = buffer
+    try:
+        returned = importlib.import_module(module_name).run(*args, **kwargs)
+        ok = not isinstance(returned, dict) or returned.get("status", "ok") == "ok"
+        status, returncode = ("ok", 0) if ok else ("error", 1)
+    except SystemExit as exc:
+        # Tools signal fatal errors with sys.exit(1), exactly as on the CLI
+        code = exc.code if isinstance(exc.code, int) else (0 if exc.code is None else 1)
+        status, returncode = ("ok" if code == 0 else "error"), code
+    except Exception:
+        traceback.print_exc()
+        status, returncode = "exception", -1
+    finally:
+        ThreadOutputRouter._local.buffer = None
+
+    outcome.update({
+        "step": label,
+        "status": status,
+        "returncode": returncode,
+        "output": buffer.getvalue().strip(),
+    })
+
+
+def run_step(module_name, label, *args, **kwargs):
     """
-    Run a subprocess command and return a result dict.
+    Run tools/<module_name>.run(*args, **kwargs) in-process and return a result dict.
     Never raises — all errors are captured and returned in the dict.
+
+    The tool runs on a daemon thread so STEP_TIMEOUT can still be enforced: a
+    step that overruns is reported as a timeout and left to finish (or die with
+    the process) in the background.
     """
+    outcome = {}
+    worker = threading.Thread(
+        target=_call_tool,
+        args=(module_name, label, args, kwargs, outcome),
+        name=f"step-{label}",
+        daemon=True,
+    )
+    worker.start()
+    worker.join(STEP_TIMEOUT)
+    if worker.is_alive():
+        return {
+            "step": label,
+            "status": "timeout",
+            "returncode": -1,
+            "output": f"Timed out after {STEP_TIMEOUT}s",
+        }
+    return outcome
+
+
+EXCEPTION_EXIT_CODE = 70  # child exit code for an uncaught exception in run()
+ISOLATED_STEP_SCRIPT = f"""
+import importlib, sys, traceback
+sys.path.insert(0, sys.argv[1])
+try:
+    returned = importlib.import_module(sys.argv[2]).run(sys.argv[3])
+except Exception:
+    traceback.print_exc()
+    sys.exit({EXCEPTION_EXIT_CODE})
+ok = not isinstance(returned, dict) or returned.get("status", "ok") == "ok"
+sys.exit(0 if ok else 1)
+"""
+
+
+def _forward_output(stream, buffer):
+    """Thread target: copy a child's output into its step buffer and the server log."""
+    for line in stream:
+        buffer.write(line)
+        sys.stdout.write(line)
+    sys.stdout.flush()
+
+
+def run_step_isolated(module_name, label, run_date):
+    """
+    Run tools/<module_name>.run(run_date) in a child Python process and return a
+    result dict shaped like run_step's. Never raises.
+
+    Unlike an in-process step, a step that overruns STEP_TIMEOUT is actually
+    stopped: the child runs in its own session and the whole process group is
+    killed. Browsers it launched exit with it, as Playwright drives them over a
+    pipe that closes when the child dies.
+    """
+    buffer = OutputTail()
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
+        proc = subprocess.Popen(
+            [PYTHON, "-c", ISOLATED_STEP_SCRIPT, TOOLS_DIR, module_name, run_date],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
             cwd=BASE_DIR,
-            timeout=STEP_TIMEOUT,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+            start_new_session=True,
         )
-        # Combine stdout + stderr; keep last 3000 chars to avoid huge responses
-        combined = (result.stdout or "") + (result.stderr or "")
+    except Exception as exc:
         return {
             "step": label,
-            "status": "ok" if result.returncode == 0 else "error",
-            "returncode": result.returncode,
-            "output": combined[-3000:].strip(),
+            "status": "exception",
+            "returncode": -1,
+            "output": str(exc),
         }
+
+    reader = threading.Thread(
+        target=_forward_output,
+        args=(proc.stdout, buffer),
+        name=f"step-{label}-output",
+        daemon=True,
+    )
+    reader.start()
+    try:
+        returncode = proc.wait(timeout=STEP_TIMEOUT)
     except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+        reader.join()
         return {
             "step": label,
             "status": "timeout",
             "returncode": -1,
-            "output": f"Timed out after {STEP_TIMEOUT}s",
+            "output": f"{buffer.getvalue().strip()}\nTimed out after {STEP_TIMEOUT}s — killed".strip(),
         }
+    reader.join()
+    if returncode == EXCEPTION_EXIT_CODE:
+        status, returncode = "exception", -1  # as run_step reports a raising tool
+    else:
+        status = "ok" if returncode == 0 else "error"
+    return {
+        "step": label,
+        "status": status,
+        "returncode": returncode,
+        "output": buffer.getvalue().strip(),
+    }
+
+
+def skipped_step(label, reason):
+    """Result dict for a step that was not run."""
+    return {
+        "step": label,
+        "status": "skipped",
+        "returncode": None,
+        "output": reason,
+    }
+
+
+def prepare_sheets_service():
+    """
+    Build the Google Sheets client ahead of the update_sheet step.
+    Returns None on failure so update_sheet retries and reports the auth error.
+    """
+    try:
+        return importlib.import_module("update_sheet").get_service()
     except Exception as exc:
-        return {
-            "step": label,
-            "status": "exception",
-            "returncode": -1,
-            "output": str(exc),
-        }
+        print(f"[sheets] Early auth failed, update_sheet will retry: {exc}", flush=True)
+        return None
+
+
+def start_sheets_service():
+    """
+    Run prepare_sheets_service on its own thread and return its future.
+    The pool is shut down without waiting, so a hung auth (e.g. an interactive
+    OAuth flow for a missing token) never blocks the run from finishing.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheets-auth")
+    future = executor.submit(prepare_sheets_service)
+    executor.shutdown(wait=False)
+    return future
+
+
+def prepared_service(future):
+    """
+    The client from start_sheets_service, or None if it failed or is still not
+    ready after STEP_TIMEOUT — update_sheet then builds its own under run_step's
+    timeout.
+    """
+    try:
+        return future.result(timeout=STEP_TIMEOUT)
+    except FutureTimeoutError:
+        print(f"[sheets] Early auth still running after {STEP_TIMEOUT}s, update_sheet will retry", flush=True)
+        return None
 
 
 # ---------------------------------------------------------------------------
@@ -108,11 +358,20 @@ def run_step(cmd, label):
 @app.route("/run-morning", methods=["POST"])
 def run_morning():
     """
-    Run all 6 predictors in sequence, then write predictions to Google Sheet.
+    Run all predictors concurrently, then write predictions to Google Sheet.
+
+    The predictors are independent I/O-bound jobs (network + Playwright), so they
+    run in a thread pool and the wall-clock cost is the slowest predictor rather
+    than the sum of all of them. update_sheet and the analysis steps only start
+    once every predictor has finished.
+
+    The predictors run in child processes (run_step_isolated) so a timed-out
+    one is killed; the sheet steps run in-process and share the Sheets client.
 
     Scraper failures are non-fatal — the run continues and SCRAPE_FAILED is
-    written to the sheet for that site. Only update_sheet is skipped if all
-    scrapers failed (nothing to write).
+    written to the sheet for that site, even when every scraper failed. A
+    predictor step is reported as "error" when none of its sites produced
+    predictions; scrape_all's per-site outcomes are listed under "sites".
     """
     err = check_api_key()
     if err:
@@ -121,26 +380,54 @@ def run_morning():
     run_date = str(date.today())
     print(f"[morning] Starting run for {run_date}", flush=True)
 
-    steps_to_run = [
-        ([PYTHON, "tools/scrape_forebet.py"],           "scrape_forebet"),
-        ([PYTHON, "tools/scrape_predictz.py"],          "scrape_predictz"),
-        ([PYTHON, "tools/scrape_onemillion.py"],        "scrape_onemillion"),
-        ([PYTHON, "tools/scrape_vitibet.py"],           "scrape_vitibet"),
-        ([PYTHON, "tools/scrape_freesupertips.py"],     "scrape_freesupertips"),
-        ([PYTHON, "tools/generate_claude_predictions.py"], "generate_claude"),
-        ([PYTHON, "tools/update_sheet.py", "--mode=predictions"], "update_sheet"),
-        ([PYTHON, "tools/generate_analysis.py"],              "generate_analysis"),
-        ([PYTHON, "tools/generate_parlay.py"],               "generate_parlay"),
+    predictor_steps = [
+        # every site scraper, concurrently on one event loop and browser
+        ("scrape_all",                  "scrape_all"),
+        ("generate_claude_predictions", "generate_claude"),
+    ]
+    sheet_steps = [
+        ("update_sheet",                {"mode": "predictions"},   "update_sheet"),
+        ("generate_analysis",           {},                        "generate_analysis"),
+        ("generate_parlay",             {},                        "generate_parlay"),
     ]
 
-    results = []
-    for cmd, label in steps_to_run:
+    # Phase 1: all predictors in parallel. Results are kept in submission order
+    # so the response layout stays stable regardless of which finishes first.
+    results_by_label = {}
+    # Sheets auth (token refresh + client build) doesn't depend on the
+    # predictors, so overlap it with them.
+    sheets_service = start_sheets_service()
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_PREDICTORS) as executor:
+        futures = {}
+        for module_name, label in predictor_steps:
+            print(f"[morning] Running {label}...", flush=True)
+            futures[executor.submit(run_step_isolated, module_name, label, run_date)] = label
+        for future in as_completed(futures):
+            label = futures[future]
+            # run_step_isolated enforces STEP_TIMEOUT itself and never raises
+            result = future.result()
+            results_by_label[label] = result
+            print(f"[morning] {label} → {result['status']}", flush=True)
+    results = [results_by_label[label] for _, label in predictor_steps]
+
+    # scrape_all is one step for five sites; read each site's outcome back from
+    # its output file so the response still shows every site, even if the step
+    # itself timed out.
+    results_by_label["scrape_all"]["sites"] = importlib.import_module("scrape_all").site_statuses(run_date)
+    for site, site_result in results_by_label["scrape_all"]["sites"].items():
+        print(f"[morning]   {site} → {site_result['status']}", flush=True)
+
+    # Phase 2: sheet write + analysis, sequential (each reads the previous output).
+    # update_sheet always runs, so failed sites still get SCRAPE_FAILED rows.
+    for module_name, kwargs, label in sheet_steps:
+        if module_name == "update_sheet":
+            kwargs = {**kwargs, "service": prepared_service(sheets_service)}
         print(f"[morning] Running {label}...", flush=True)
-        result = run_step(cmd, label)
+        result = run_step(module_name, label, run_date, **kwargs)
         results.append(result)
         print(f"[morning] {label} → {result['status']}", flush=True)
 
-    scraper_results = results[:-3]  # all scrapers (indices 0-6)
+    scraper_results = results[:-3]  # all predictor steps
     sheet_result = results[-3]      # update_sheet
     # results[-2] is generate_analysis — non-fatal
     # results[-1] is generate_parlay — non-fatal
@@ -168,8 +455,9 @@ def run_evening():
     """
     Fetch results → score predictions → update sheet + rebuild leaderboard.
 
-    Steps are sequential and dependent: if fetch_results fails, scoring will
-    also fail (no results file). All steps always run so every error is reported.
+    Steps are sequential and dependent, so the run stops at the first failing
+    step and the remaining steps are reported as "skipped". Only the Sheets
+    client setup runs alongside them.
     """
     err = check_api_key()
     if err:
@@ -179,18 +467,30 @@ def run_evening():
     print(f"[evening] Starting run for {run_date}", flush=True)
 
     steps_to_run = [
-        ([PYTHON, "tools/fetch_results.py"],               "fetch_results"),
-        ([PYTHON, "tools/score_predictions.py"],           "score_predictions"),
-        ([PYTHON, "tools/update_sheet.py", "--mode=results"], "update_sheet"),
+        ("fetch_results",     {},                  "fetch_results"),
+        ("score_predictions", {},                  "score_predictions"),
+        ("update_sheet",      {"mode": "results"}, "update_sheet"),
     ]
 
+    # Sheets auth (token refresh + client build) doesn't depend on the
+    # results, so overlap it with fetch + score instead of paying it after.
+    sheets_service = start_sheets_service()
+
     results = []
-    for cmd, label in steps_to_run:
+    for module_name, kwargs, label in steps_to_run:
+        if module_name == "update_sheet":
+            kwargs = {**kwargs, "service": prepared_service(sheets_service)}
         print(f"[evening] Running {label}...", flush=True)
-        result = run_step(cmd, label)
+        result = run_step(module_name, label, run_date, **kwargs)
         results.append(result)
         print(f"[evening] {label} → {result['status']}", flush=True)
 
+        if result["status"] != "ok":
+            # Every later step depends on this one, so it is bound to fail too
+            for _, _, skipped_label in steps_to_run[len(results):]:
+                results.append(skipped_step(skipped_label, f"Skipped because {label} failed"))
+            break
+
     overall = "ok" if all(r["status"] == "ok" for r in results) else "error"
 
     return jsonify({
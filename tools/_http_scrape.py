@@ -0,0 +1,33 @@
+"""
+_http_scrape.py — Plain HTTP fetch for pages whose prediction rows are server-rendered
+
+Forebet, onemillion and predictz ship their tables in the initial HTML, so a
+single GET plus a selectolax parse gives the same rows as a full Chromium page
+load. Scrapers try this first and only fall back to Playwright when the static
+response does not contain the rows (JS-rendered or a bot challenge).
+"""
+
+import httpx
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+async def fetch_html(url, headers=None, timeout=20.0):
+    """Return the response body for url, or None on any HTTP/network error."""
+    request_headers = {"User-Agent": USER_AGENT}
+    request_headers.update(headers or {})
+    try:
+        async with httpx.AsyncClient(
+            http2=True, headers=request_headers, timeout=timeout, follow_redirects=True,
+        ) as client:
+            resp = await client.get(url)
+            resp.raise_for_status()
+            return resp.text
+    except httpx.HTTPError as e:
+        detail = str(e).splitlines()[0] if str(e) else ""
+        print(f"  [http] {url} → {e.__class__.__name__}: {detail}")
+        return None
@@ -0,0 +1,61 @@
+"""
+_scrape_cache.py — On-disk cache of rendered scraper HTML
+
+The prediction sites refresh their tables roughly once a day, so a same-day
+re-run can parse the HTML saved by the previous run instead of loading the
+page again.
+
+Entries live at .tmp/cache/{site}_{YYYYMMDDHH}.html; the newest entry for a site
+is served while it is from today and younger than max_age seconds.
+"""
+
+import glob
+import os
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, ".tmp", "cache")
+
+MAX_AGE = 6 * 3600  # seconds
+
+
+def _entries(site, day=""):
+    """
+    Cache files for site, newest first (the hour bucket sorts lexically).
+    day ("YYYYMMDD") limits them to that day's buckets.
+    """
+    return sorted(glob.glob(os.path.join(CACHE_DIR, f"{site}_{day}*.html")), reverse=True)
+
+
+def read(site, max_age=MAX_AGE):
+    """
+    Return the cached HTML for site if a fresh entry from today exists, else
+    None. A page cached before midnight is never reused for the new day.
+    """
+    for path in _entries(site, f"{datetime.now():%Y%m%d}"):
+        try:
+            if time.time() - os.path.getmtime(path) > max_age:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            continue  # pruned by a concurrent write
+    return None
+
+
+def write(site, html):
+    """Store html as the current hour's entry for site and drop older entries."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{site}_{datetime.now():%Y%m%d%H}.html")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp_path, path)  # readers never see a partial page
+    for old in _entries(site):
+        if old != path:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+    return path
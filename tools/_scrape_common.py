@@ -0,0 +1,252 @@
+"""
+_scrape_common.py — Shared plumbing for the prediction scrapers
+
+Output files, browser contexts, failure debug dumps and the
+cache → static HTTP → Playwright flow live here, so each scrape_*.py only
+defines its site constants and how to parse the page.
+
+Output: .tmp/predictions_{site}_{date}.json
+"""
+
+import asyncio
+import os
+import time
+from datetime import date
+
+import orjson
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+
+import _http_scrape
+import _scrape_cache as html_cache
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = os.path.join(BASE_DIR, ".tmp")
+
+USER_AGENT = _http_scrape.USER_AGENT
+
+# Only text is parsed, so skip downloading (and laying out) heavy assets.
+# Documents, scripts and XHR/fetch still load so JS-rendered tables appear.
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+
+MAX_PREDICTIONS = 5  # picks kept per site
+OUTPUT_MAX_AGE = 3600  # seconds a finished output file is reused on a rerun
+
+# Passed to every Chromium launch, ahead of any site-specific args. Playwright
+# already adds --no-sandbox, --disable-dev-shm-usage and --disable-extensions;
+# the headless pages never need the GPU process either.
+LAUNCH_ARGS = ["--disable-gpu"]
+
+
+def output_path(site, run_date):
+    return os.path.join(TMP_DIR, f"predictions_{site}_{run_date}.json")
+
+
+def write_output(site, run_date, predictions, error=None):
+    """
+    Write the predictions file via a temp file + os.replace, so a crashed run
+    never leaves a half-written file for update_sheet to choke on.
+    """
+    os.makedirs(TMP_DIR, exist_ok=True)
+    output = {
+        "date": run_date,
+        "site": site,
+        "status": "ok" if not error else "failed",
+        "error": error,
+        "predictions": predictions,
+    }
+    path = output_path(site, run_date)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_output(site, run_date, max_age=OUTPUT_MAX_AGE):
+    """
+    Return the path of a successful predictions file for run_date written
+    within max_age seconds, or None, so a rerun can skip the scrape.
+    """
+    path = output_path(site, run_date)
+    try:
+        with open(path, "rb") as f:
+            if time.time() - os.fstat(f.fileno()).st_mtime > max_age:
+                return None
+            data = orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+    if data.get("status") != "ok" or not data.get("predictions"):
+        return None
+    return path
+
+
+def succeed(site, run_date, predictions, source=None):
+    """Write the top MAX_PREDICTIONS predictions and return the ok status dict."""
+    suffix = f" from {source}" if source else ""
+    print(f"[{site}] Extracted {len(predictions)} predictions{suffix}")
+    path = write_output(site, run_date, predictions[:MAX_PREDICTIONS])
+    print(f"[{site}] Output: {path}")
+    return {"status": "ok", "error": None, "path": path}
+
+
+async def fail(page, site, run_date, error_msg):
+    """Save a debug screenshot if possible, write the failed output and return its status dict."""
+    print(f"[{site}] ERROR: {error_msg}")
+    screenshot_path = os.path.join(TMP_DIR, f"debug_{site}_{run_date}.jpg")
+    try:
+        await page.screenshot(path=screenshot_path, type="jpeg", quality=60, full_page=False)
+        print(f"[{site}] Debug screenshot: {screenshot_path}")
+    except Exception:
+        pass
+    path = write_output(site, run_date, [], error=error_msg)
+    print(f"[{site}] Failed output written to {path}")
+    return {"status": "failed", "error": error_msg, "path": path}
+
+
+async def no_predictions_error(page, site, run_date, html=None):
+    """Dump the page HTML and a screenshot, and return the ValueError to raise."""
+    html_path = os.path.join(TMP_DIR, f"debug_{site}_{run_date}.html")
+    with open(html_path, "w") as f:
+        f.write(html if html is not None else await page.content())
+    screenshot_path = os.path.join(TMP_DIR, f"debug_{site}_{run_date}.jpg")
+    await page.screenshot(path=screenshot_path, type="jpeg", quality=60, full_page=False)
+    return ValueError(
+        f"No predictions extracted. Debug files:\n"
+        f"  Screenshot: {screenshot_path}\n  HTML: {html_path}"
+    )
+
+
+def _state_path(site):
+    return os.path.join(TMP_DIR, f"state_{site}.json")
+
+
+def load_state(site):
+    """Cookies/localStorage saved by the site's last successful scrape, or None."""
+    try:
+        with open(_state_path(site), "rb") as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+
+async def save_state(context, site):
+    """
+    Persist the context's storage state so the next run is a returning visitor
+    (consent banners dismissed, challenge cookies kept). Best effort.
+    """
+    try:
+        state = await context.storage_state()
+        path = _state_path(site)
+        with open(path + ".tmp", "wb") as f:
+            f.write(orjson.dumps(state))
+        os.replace(path + ".tmp", path)
+    except Exception as e:
+        print(f"[{site}] Could not save browser state: {e}")
+
+
+async def new_context(browser, site, init_script=None, **options):
+    """
+    Browser context with the default user agent, the site's saved storage
+    state and heavy resources blocked.
+    """
+    options.setdefault("user_agent", USER_AGENT)
+    options.setdefault("storage_state", load_state(site))
+    context = await browser.new_context(**options)
+    if init_script:
+        await context.add_init_script(init_script)
+    await context.route("**/*", lambda route: (
+        route.abort() if route.request.resource_type in BLOCKED_RESOURCE_TYPES
+        else route.continue_()
+    ))
+    return context
+
+
+async def scrape_site(browser, site, url, parse_html, wait_selector, run_date=None,
+                      context_options=None, init_script=None, goto_timeout=30000,
+                      http_headers=None):
+    """
+    Scrape a site whose prediction rows are in the server-rendered HTML.
+
+    Tries the HTML cache, then a plain GET (sent with http_headers), and only
+    opens a Playwright page if neither parses to any predictions.
+    parse_html(html) returns prediction dicts.
+    """
+    run_date = run_date or str(date.today())
+    print(f"[{site}] Scraping {url} for {run_date} ...")
+
+    html = html_cache.read(site)
+    source = "cached HTML"
+    predictions = parse_html(html) if html else []
+    if not predictions:
+        html = await _http_scrape.fetch_html(url, headers=http_headers)
+        source = "static HTML"
+        predictions = parse_html(html) if html else []
+        if predictions:
+            html_cache.write(site, html)
+    if predictions:
+        return succeed(site, run_date, predictions, source)
+    print(f"[{site}] No rows in static HTML, falling back to Playwright")
+
+    context = await new_context(browser, site, init_script=init_script, **(context_options or {}))
+    page = await context.new_page()
+
+    try:
+        await page.goto(url, wait_until="domcontentloaded", timeout=goto_timeout)
+        try:
+            await page.wait_for_selector(wait_selector, state="attached", timeout=15000)
+        except PlaywrightTimeoutError:
+            pass  # parse_html finds nothing and the debug dump below kicks in
+
+        # One CDP call for the whole document, then parse it in-process
+        html = await page.content()
+        predictions = parse_html(html)
+
+        if not predictions:
+            raise await no_predictions_error(page, site, run_date, html)
+
+        html_cache.write(site, html)
+        await save_state(context, site)
+        return succeed(site, run_date, predictions)
+
+    except Exception as e:
+        return await fail(page, site, run_date, str(e))
+
+    finally:
+        await context.close()
+
+
+class LazyBrowser:
+    """
+    Stand-in for a Playwright Browser that launches Chromium on the first
+    new_context() call, so scrapes answered from cache or static HTML never
+    start a browser at all.
+    """
+
+    def __init__(self, playwright, launch_args=None):
+        self._playwright = playwright
+        self._launch_args = LAUNCH_ARGS + (launch_args or [])
+        self._browser = None
+        self._lock = asyncio.Lock()
+
+    async def new_context(self, **options):
+        async with self._lock:
+            if self._browser is None:
+                self._browser = await self._playwright.chromium.launch(
+                    headless=True, args=self._launch_args,
+                )
+        return await self._browser.new_context(**options)
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+
+
+async def run_standalone(scrape, run_date=None, launch_args=None):
+    """Run scrape(browser, run_date) with its own (lazily launched) browser; scrape_all.py shares one."""
+    async with async_playwright() as p:
+        browser = LazyBrowser(p, launch_args)
+        try:
+            return await scrape(browser, run_date)
+        finally:
+            await browser.close()
@@ -11,6 +11,10 @@ Only includes FINISHED matches.
 
 Output: .tmp/results_{date}.json
 
+If that file already exists with status "ok", was written after run_date had
+ended (so no more matches can finish) and contains matches, it is reused and
+the API is not called. Pass --force to always re-fetch.
+
 Tracked competitions (free tier):
   CL   Champions League
   EL   Europa League
@@ -25,13 +29,16 @@ Tracked competitions (free tier):
   PPL  Primeira Liga
 """
 
-import json
+import argparse
 import os
 import sys
 from datetime import date, timedelta
 
+import orjson
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TMP_DIR = os.path.join(BASE_DIR, ".tmp")
@@ -42,6 +49,20 @@ load_dotenv(ENV_FILE)
 API_KEY = os.environ.get("FOOTBALL_DATA_API_KEY")
 API_BASE = "https://api.football-data.org/v4"
 
+# One keep-alive session for all API calls. Rate limiting (429) and transient
+# 5xx errors are retried with exponential backoff, honouring Retry-After.
+SESSION = requests.Session()
+if API_KEY:
+    SESSION.headers["X-Auth-Token"] = API_KEY
+SESSION.mount("https://", HTTPAdapter(max_retries=Retry(
+    total=3,
+    backoff_factor=1.0,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["GET"],
+    respect_retry_after_header=True,
+    raise_on_status=False,  # hand the final response back so we can report it
+)))
+
 WINNER_MAP = {
     "HOME_TEAM": "1",
     "DRAW": "X",
@@ -50,6 +71,10 @@ WINNER_MAP = {
 
 
 def write_output(run_date, matches, error=None):
+    """
+    Write the results file via a temp file + os.replace, so a crashed run never
+    leaves a half-written file for load_cached or score_predictions to read.
+    """
     os.makedirs(TMP_DIR, exist_ok=True)
     output = {
         "date": run_date,
@@ -58,8 +83,29 @@ def write_output(run_date, matches, error=None):
         "matches": matches,
     }
     path = os.path.join(TMP_DIR, f"results_{run_date}.json")
-    with open(path, "w") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_cached(run_date):
+    """
+    Return the path of a complete results file for run_date, or None.
+    A file fetched on run_date itself may be missing late kick-offs, so only
+    files written on a later day count as complete.
+    """
+    path = os.path.join(TMP_DIR, f"results_{run_date}.json")
+    try:
+        with open(path, "rb") as f:
+            if date.fromtimestamp(os.fstat(f.fileno()).st_mtime) <= date.fromisoformat(run_date):
+                return None
+            data = orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+    if data.get("status") != "ok" or not data.get("matches"):
+        return None
     return path
 
 
@@ -67,7 +113,6 @@ def fetch_matches(run_date):
     if not API_KEY:
         raise ValueError("FOOTBALL_DATA_API_KEY not found in .env")
 
-    headers = {"X-Auth-Token": API_KEY}
     # Query a 3-day window around run_date. The API inconsistently returns
     # incomplete results when dateFrom == dateTo; a range query is reliable.
     d = date.fromisoformat(run_date)
@@ -77,43 +122,44 @@ def fetch_matches(run_date):
     }
 
     print(f"Fetching matches for {run_date} from football-data.org ...")
-    resp = requests.get(f"{API_BASE}/matches", headers=headers, params=params, timeout=15)
+    resp = SESSION.get(f"{API_BASE}/matches", params=params, timeout=15)
 
-    if resp.status_code == 429:
-        raise RuntimeError(
-            f"Rate limited (429). Wait a minute and retry.\n"
-            f"Response: {resp.text[:200]}"
-        )
     if resp.status_code != 200:
         raise RuntimeError(
             f"API error {resp.status_code}: {resp.text[:300]}"
         )
 
-    # Filter to only matches whose UTC date matches run_date
-    all_matches = resp.json().get("matches", [])
-    return [m for m in all_matches if m.get("utcDate", "").startswith(run_date)]
+    # Filtering to run_date happens in parse_matches, in the same pass as parsing
+    return orjson.loads(resp.content).get("matches", [])
 
 
-def parse_matches(raw_matches):
+def parse_matches(raw_matches, run_date):
+    """
+    Parse FINISHED matches played on run_date (UTC) out of the raw API window.
+    Filtering and parsing happen in one pass; each nested dict is looked up once.
+    """
     matches = []
     finished = 0
     skipped = 0
 
     for m in raw_matches:
-        status = m.get("status", "")
-        if status != "FINISHED":
+        # The API is queried for a 3-day window — keep only run_date
+        if not m.get("utcDate", "").startswith(run_date):
+            continue
+
+        if m.get("status", "") != "FINISHED":
             skipped += 1
             continue
 
         finished += 1
-        winner = m.get("score", {}).get("winner")
-        result = WINNER_MAP.get(winner)
+        score = m.get("score") or {}
+        ft = score.get("fullTime") or {}
+        home_score = ft.get("home")
+        away_score = ft.get("away")
+        result = WINNER_MAP.get(score.get("winner"))
 
         if not result:
             # Match might have ended without a clear winner (e.g. penalties)
-            ft = m.get("score", {}).get("fullTime", {})
-            home_score = ft.get("home")
-            away_score = ft.get("away")
             if home_score is not None and away_score is not None:
                 if home_score > away_score:
                     result = "1"
@@ -122,39 +168,40 @@ def parse_matches(raw_matches):
                 else:
                     result = "2"
 
-        home_team = m.get("homeTeam", {}).get("name", "")
-        away_team = m.get("awayTeam", {}).get("name", "")
-        short_home = m.get("homeTeam", {}).get("shortName", home_team)
-        short_away = m.get("awayTeam", {}).get("shortName", away_team)
-        ft = m.get("score", {}).get("fullTime", {})
+        home = m.get("homeTeam") or {}
+        away = m.get("awayTeam") or {}
+        home_team = home.get("name", "")
+        away_team = away.get("name", "")
 
         matches.append({
             "home_team": home_team,
             "away_team": away_team,
-            "short_home": short_home,
-            "short_away": short_away,
+            "short_home": home.get("shortName", home_team),
+            "short_away": away.get("shortName", away_team),
             "result": result,
-            "home_score": ft.get("home"),
-            "away_score": ft.get("away"),
-            "competition": m.get("competition", {}).get("name", ""),
+            "home_score": home_score,
+            "away_score": away_score,
+            "competition": (m.get("competition") or {}).get("name", ""),
         })
 
     return matches, finished, skipped
 
 
-def main():
-    import argparse
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--date", default=str(date.today()), help="Date in YYYY-MM-DD format")
-    args = parser.parse_args()
-    run_date = args.date
+def run(run_date, force=False):
+    """Fetch, parse and store results for run_date. Returns a status dict."""
     print(f"fetch_results.py — date={run_date}")
 
+    if not force:
+        cached = load_cached(run_date)
+        if cached:
+            print(f"Cache hit — reusing {cached} (pass --force to re-fetch)")
+            return {"status": "ok", "error": None, "path": cached}
+
     try:
         raw = fetch_matches(run_date)
-        print(f"API returned {len(raw)} matches total")
+        print(f"API returned {len(raw)} matches in the 3-day window")
 
-        matches, finished, skipped = parse_matches(raw)
+        matches, finished, skipped = parse_matches(raw, run_date)
         print(f"  Finished: {finished}, Not yet played / postponed: {skipped}")
         print(f"  Stored {len(matches)} results")
 
@@ -166,9 +213,22 @@ def main():
             for m in matches[:5]:
                 print(f"  {m['home_team']} {m['home_score']}-{m['away_score']} {m['away_team']} → {m['result']}")
 
+        return {"status": "ok", "error": None, "path": path}
+
     except Exception as e:
         print(f"ERROR: {e}")
-        write_output(run_date, [], error=str(e))
+        path = write_output(run_date, [], error=str(e))
+        return {"status": "failed", "error": str(e), "path": path}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--date", default=str(date.today()), help="Date in YYYY-MM-DD format")
+    parser.add_argument("--force", action="store_true", help="Ignore a cached results file and re-fetch")
+    args = parser.parse_args()
+
+    result = run(args.date, force=args.force)
+    if result["status"] != "ok":
         sys.exit(1)
 
 
@@ -419,12 +419,8 @@ def format_analysis_tab(service, sheet_id, rows, lb_start_row, consensus_start_r
 # Entry point
 # ---------------------------------------------------------------------------
 
-def main():
-    parser = argparse.ArgumentParser(description="Generate daily analysis for bet tracker")
-    parser.add_argument("--date", default=str(date.today()), help="Date in YYYY-MM-DD format")
-    args = parser.parse_args()
-
-    run_date = args.date
+def run(run_date):
+    """In-process entry point used by server.py. Returns a status dict."""
     print(f"generate_analysis.py — date={run_date}")
 
     service = get_service()
@@ -434,7 +430,7 @@ def main():
     predictions = read_todays_predictions(service, run_date)
     if not predictions:
         print(f"No predictions found for {run_date} — skipping analysis")
-        return
+        return {"status": "ok", "error": None}
 
     print(f"  Found {len(predictions)} predictions across {len(set(p['site'] for p in predictions))} sites")
 
@@ -459,6 +455,14 @@ def main():
     write_analysis(service, run_date, consensus, leaderboard, commentary)
 
     print(f"\nAnalysis complete for {run_date}")
+    return {"status": "ok", "error": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate daily analysis for bet tracker")
+    parser.add_argument("--date", default=str(date.today()), help="Date in YYYY-MM-DD format")
+    args = parser.parse_args()
+    run(args.date)
 
 
 if __name__ == "__main__":
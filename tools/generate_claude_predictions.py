@@ -15,10 +15,10 @@ Output: .tmp/predictions_claude_{date}.json
 import json
 import os
 import re
-import sys
 import traceback
 from datetime import date
 
+import orjson
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -31,6 +31,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TMP_DIR = os.path.join(BASE_DIR, ".tmp")
 
 WEB_SEARCH_TOOL = {"type": "web_search_20250305", "name": "web_search"}
+JSON_BLOCK_RE = re.compile(r"```json\s*([\s\S]+?)\s*```")
 
 PROMPT_TEMPLATE = """\
 Today is {date}.
@@ -77,14 +78,14 @@ def write_output(run_date, predictions, error=None):
         "predictions": predictions,
     }
     path = os.path.join(TMP_DIR, f"predictions_{SITE}_{run_date}.json")
-    with open(path, "w") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
     return path
 
 
 def extract_json(text):
     """Extract and parse the JSON predictions block from Claude's response."""
-    match = re.search(r"```json\s*([\s\S]+?)\s*```", text)
+    match = JSON_BLOCK_RE.search(text)
     if not match:
         raise ValueError("No ```json ... ``` block found in response")
     return json.loads(match.group(1))
@@ -158,8 +159,9 @@ def run_agentic_loop(client, run_date):
     raise RuntimeError(f"Agentic loop did not complete within {MAX_ITERATIONS} iterations")
 
 
-def main():
-    run_date = str(date.today())
+def run(run_date=None):
+    """Generate and store Claude's predictions for run_date. Returns a status dict."""
+    run_date = run_date or str(date.today())
     print(f"[{SITE}] Generating predictions for {run_date} using {MODEL}...")
 
     api_key = os.environ.get("ANTHROPIC_API_KEY")
@@ -168,18 +170,25 @@ def main():
         print(f"[{SITE}] PRED_FAILED — {error_msg}")
         path = write_output(run_date, [], error=error_msg)
         print(f"[{SITE}] Failed output written to {path}")
-        sys.exit(0)
+        return {"status": "failed", "error": error_msg, "path": path}
 
     try:
         import anthropic
+        import httpx
     except ImportError:
         error_msg = "anthropic package not installed — run: pip install anthropic"
         print(f"[{SITE}] PRED_FAILED — {error_msg}")
         path = write_output(run_date, [], error=error_msg)
         print(f"[{SITE}] Failed output written to {path}")
-        sys.exit(0)
+        return {"status": "failed", "error": error_msg, "path": path}
 
-    client = anthropic.Anthropic(api_key=api_key)
+    # One HTTP/2 connection pool for every call in the agentic loop; the SDK's
+    # default client keeps its timeouts and retry settings.
+    http_client = anthropic.DefaultHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=4),
+    )
+    client = anthropic.Anthropic(api_key=api_key, http_client=http_client)
 
     try:
         final_text = run_agentic_loop(client, run_date)
@@ -189,7 +198,9 @@ def main():
         print(f"[{SITE}] PRED_FAILED — {error_msg}")
         path = write_output(run_date, [], error=error_msg)
         print(f"[{SITE}] Failed output written to {path}")
-        sys.exit(0)
+        return {"status": "failed", "error": error_msg, "path": path}
+    finally:
+        http_client.close()
 
     try:
         raw = extract_json(final_text)
@@ -200,7 +211,7 @@ def main():
         print(f"  [claude] Raw response snippet: {final_text[:500]}")
         path = write_output(run_date, [], error=error_msg)
         print(f"[{SITE}] Failed output written to {path}")
-        sys.exit(0)
+        return {"status": "failed", "error": error_msg, "path": path}
 
     for p in predictions:
         label = {"1": "Home win", "X": "Draw", "2": "Away win"}[p["prediction"]]
@@ -209,6 +220,11 @@ def main():
     print(f"[{SITE}] Extracted {len(predictions)} predictions")
     path = write_output(run_date, predictions)
     print(f"[{SITE}] Output: {path}")
+    return {"status": "ok", "error": None, "path": path}
+
+
+def main():
+    run()
 
 
 if __name__ == "__main__":
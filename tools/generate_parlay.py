@@ -502,14 +502,11 @@ def _header_format(sheet_id, row_idx, bg_color, font_size=11, white_text=False):
 # Entry point
 # ---------------------------------------------------------------------------
 
-def main():
-    run_date = str(date.today())
-
-    parser = argparse.ArgumentParser(description="Generate daily parlay recommendation")
-    parser.add_argument("--date", default=run_date, help="Date in YYYY-MM-DD format")
-    args = parser.parse_args()
-    run_date = args.date
-
+def run(run_date):
+    """
+    In-process entry point used by server.py. Returns a status dict.
+    Fatal errors still exit with code 1, exactly as on the command line.
+    """
     print(f"generate_parlay.py — date={run_date}", flush=True)
 
     api_key = os.environ.get("ANTHROPIC_API_KEY")
@@ -576,6 +573,14 @@ def main():
     write_parlay(service, run_date, parlay_data)
 
     print(f"[parlay] Complete for {run_date}", flush=True)
+    return {"status": "ok", "error": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate daily parlay recommendation")
+    parser.add_argument("--date", default=str(date.today()), help="Date in YYYY-MM-DD format")
+    args = parser.parse_args()
+    run(args.date)
 
 
 if __name__ == "__main__":
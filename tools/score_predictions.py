@@ -5,8 +5,9 @@ Reads:
   .tmp/predictions_{site}_{date}.json  (for each of 5 sites)
   .tmp/results_{date}.json
 
-Uses rapidfuzz for fuzzy team name matching (threshold: 60).
-Both long name and short name from the results file are tried.
+Uses rapidfuzz for fuzzy team name matching (threshold: 55).
+Both long name and short name from the results file are tried. All predictions
+are scored against all results in one vectorised rapidfuzz.process.cdist call.
 
 Produces:
   .tmp/scores_{date}.json
@@ -35,14 +36,18 @@ Correct values:
   "UNMATCHED"  — could not find this match in results (not penalised)
 """
 
-import json
+import argparse
+import functools
 import os
 import re
 import sys
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 
-from rapidfuzz import fuzz
+import numpy as np
+import orjson
+from rapidfuzz import fuzz, process
 
 SITES = ["forebet", "predictz", "onemillion", "vitibet", "freesupertips", "claude"]
 FUZZY_THRESHOLD = 55
@@ -128,45 +133,65 @@ TEAM_ALIASES = {
     "everton liverpool":          "everton",
 }
 
+# Club-type abbreviations that differ across sites (FC, AFC, BC, SC, …)
+CLUB_ABBREV_RE = re.compile(
+    r"\b(afc|bc|fc|cf|sc|ac|rc|bv|sv|vv|if|fk|sk|uk|as|ss|us|cd|sd|rcd|ud|osc|losc|sbv|vfb|vfl|hsv|rb)\b"
+)
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TMP_DIR = os.path.join(BASE_DIR, ".tmp")
 
 
+def _load_site_predictions(site, run_date):
+    """Read one site's predictions file. Returns (predictions, warning_or_None)."""
+    path = os.path.join(TMP_DIR, f"predictions_{site}_{run_date}.json")
+    try:
+        with open(path, "rb") as f:
+            data = orjson.loads(f.read())
+    except FileNotFoundError:
+        return [], f"  WARNING: no predictions file for {site} on {run_date}"
+    if data["status"] == "failed":
+        return [], f"  [{site}] was SCRAPE_FAILED — skipping"
+    return data["predictions"], None
+
+
 def load_predictions(run_date):
-    """Load all site prediction files. Returns dict: site -> predictions list."""
+    """
+    Load all site prediction files. Returns dict: site -> predictions list.
+    Files are read concurrently; warnings are printed afterwards in SITES order
+    from the calling thread.
+    """
+    with ThreadPoolExecutor(max_workers=len(SITES)) as executor:
+        futures = {site: executor.submit(_load_site_predictions, site, run_date) for site in SITES}
+
     all_preds = {}
     for site in SITES:
-        path = os.path.join(TMP_DIR, f"predictions_{site}_{run_date}.json")
-        if not os.path.exists(path):
-            print(f"  WARNING: no predictions file for {site} on {run_date}")
-            all_preds[site] = []
-            continue
-        with open(path) as f:
-            data = json.load(f)
-        if data["status"] == "failed":
-            print(f"  [{site}] was SCRAPE_FAILED — skipping")
-            all_preds[site] = []
-        else:
-            all_preds[site] = data["predictions"]
+        preds, warning = futures[site].result()
+        if warning:
+            print(warning)
+        all_preds[site] = preds
     return all_preds
 
 
 def load_results(run_date):
     path = os.path.join(TMP_DIR, f"results_{run_date}.json")
-    if not os.path.exists(path):
+    try:
+        with open(path, "rb") as f:
+            data = orjson.loads(f.read())
+    except FileNotFoundError:
         print(f"ERROR: results file not found: {path}")
         print("Run fetch_results.py first.")
         sys.exit(1)
-    with open(path) as f:
-        data = json.load(f)
     if data.get("status") == "failed":
         print(f"ERROR: results file has failed status: {data.get('error')}")
         sys.exit(1)
     return data["matches"]
 
 
+@functools.lru_cache(maxsize=4096)
 def normalize(name):
-    """Normalize team name for fuzzy comparison.
+    """Normalize team name for fuzzy comparison. Cached — only a few dozen
+    distinct team names appear per day.
 
     Steps:
       1. Strip accents (Fenerbahçe → Fenerbahce, München → Munchen)
@@ -185,11 +210,7 @@ def normalize(name):
     # 3. Normalise punctuation (apostrophes/dots for M'gladbach, M.gladbach etc.)
     n = n.replace("-", " ").replace("_", " ").replace("'", " ").replace(".", " ")
     # 4. Strip common club-type abbreviations that differ across sites
-    n = re.sub(
-        r"\b(afc|bc|fc|cf|sc|ac|rc|bv|sv|vv|if|fk|sk|uk|as|ss|us|cd|sd|rcd|ud|osc|losc|sbv|vfb|vfl|hsv|rb)\b",
-        "",
-        n,
-    )
+    n = CLUB_ABBREV_RE.sub("", n)
     n = " ".join(n.split())  # collapse whitespace
     # 5. Strip trailing city word appended by Vitibet (e.g. "Everton Liverpool" → "Everton")
     words = n.split()
@@ -200,57 +221,115 @@ def normalize(name):
     return n
 
 
-def find_result(pred_home, pred_away, results):
+def sort_tokens(name):
+    """Sort a normalized name's words — fuzz.ratio on sorted names == token_sort_ratio."""
+    return " ".join(sorted(name.split()))
+
+
+def build_candidates(results):
+    """
+    Precompute the name candidates for every result, once per run.
+
+    Each result contributes up to 4 candidates (full/short home × full/short away).
+    Returns a dict of parallel lists — raw names (for debug output), token-sorted
+    normalized names (for scoring) and the owning result — plus an exact-match
+    index (norm_home, norm_away) -> first candidate index.
+    """
+    candidates = {
+        "home": [], "away": [],
+        "sorted_home": [], "sorted_away": [],
+        "result": [],
+        "exact": {},
+    }
+    for r in results:
+        for home in (r["home_team"], r.get("short_home", "")):
+            for away in (r["away_team"], r.get("short_away", "")):
+                if not home or not away:
+                    continue
+                norm_home = normalize(home)
+                norm_away = normalize(away)
+                candidates["exact"].setdefault((norm_home, norm_away), len(candidates["result"]))
+                candidates["home"].append(home)
+                candidates["away"].append(away)
+                candidates["sorted_home"].append(sort_tokens(norm_home))
+                candidates["sorted_away"].append(sort_tokens(norm_away))
+                candidates["result"].append(r)
+    return candidates
+
+
+def find_results(norm_pairs, candidates):
     """
-    Find the best matching result for a predicted match using fuzzy string matching.
-    Returns (matched_result_or_None, best_score, best_api_home, best_api_away).
+    Find the best matching result for each normalized (home, away) pair.
+    Returns a list aligned with norm_pairs of
+    (matched_result_or_None, best_score, best_api_home, best_api_away).
     The debug fields are populated even when no match reaches the threshold, so
     callers can log what the closest candidate was.
-    """
-    best_score = 0
-    best_match = None
-    best_api_home = ""
-    best_api_away = ""
 
-    norm_pred_home = normalize(pred_home)
-    norm_pred_away = normalize(pred_away)
+    Pairs equal to a candidate are resolved with a single dict lookup. The rest
+    are fuzzy-matched: the home and away score matrices (misses × candidates)
+    are each computed in a single cdist call; ties go to the earliest candidate,
+    as with a linear scan.
 
-    for r in results:
-        # Build candidate name strings — try both full and short names
-        candidates_home = [r["home_team"], r.get("short_home", "")]
-        candidates_away = [r["away_team"], r.get("short_away", "")]
+    Scoring is token_sort_ratio, computed as fuzz.ratio over names whose tokens
+    were sorted up front — identical scores, without re-sorting per comparison.
+    """
+    if not norm_pairs:
+        return []
+    if not candidates["result"]:
+        return [(None, 0, "", "")] * len(norm_pairs)
+
+    matches = [None] * len(norm_pairs)
+    misses = []
+    for row, pair in enumerate(norm_pairs):
+        hit = candidates["exact"].get(pair)
+        if hit is None:
+            misses.append(row)
+        else:
+            matches[row] = (candidates["result"][hit], 100.0, candidates["home"][hit], candidates["away"][hit])
 
-        for cand_home in candidates_home:
-            for cand_away in candidates_away:
-                if not cand_home or not cand_away:
-                    continue
-                score_h = fuzz.token_sort_ratio(norm_pred_home, normalize(cand_home))
-                score_a = fuzz.token_sort_ratio(norm_pred_away, normalize(cand_away))
-                combined = (score_h + score_a) / 2
+    if not misses:
+        return matches
 
-                if combined > best_score:
-                    best_score = combined
-                    best_match = r
-                    best_api_home = cand_home
-                    best_api_away = cand_away
+    home_scores = process.cdist(
+        [sort_tokens(norm_pairs[row][0]) for row in misses],
+        candidates["sorted_home"],
+        scorer=fuzz.ratio,
+        dtype=np.float64,
+    )
+    away_scores = process.cdist(
+        [sort_tokens(norm_pairs[row][1]) for row in misses],
+        candidates["sorted_away"],
+        scorer=fuzz.ratio,
+        dtype=np.float64,
+    )
+    combined = (home_scores + away_scores) / 2
+    best_indices = combined.argmax(axis=1)
 
-    if best_score >= FUZZY_THRESHOLD:
-        return best_match, best_score, best_api_home, best_api_away
-    return None, best_score, best_api_home, best_api_away
+    for miss, (row, best) in enumerate(zip(misses, best_indices)):
+        best_score = float(combined[miss, best])
+        matched = candidates["result"][best] if best_score >= FUZZY_THRESHOLD else None
+        matches[row] = (matched, best_score, candidates["home"][best], candidates["away"][best])
+    return matches
 
 
-def main():
-    import argparse
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--date", default=str(date.today()), help="Date in YYYY-MM-DD format")
-    args = parser.parse_args()
-    run_date = args.date
+def run(run_date):
+    """Score every site's predictions for run_date. Returns a status dict."""
     print(f"score_predictions.py — date={run_date}")
 
     all_predictions = load_predictions(run_date)
     results = load_results(run_date)
+    candidates = build_candidates(results)
     print(f"Loaded {len(results)} results from results file")
 
+    # Match every distinct prediction across all sites in one batch — sites
+    # often pick the same fixtures, so each pair is only matched once
+    norm_pairs = list(dict.fromkeys(
+        (normalize(pred["home_team"]), normalize(pred["away_team"]))
+        for site in SITES
+        for pred in all_predictions.get(site, [])
+    ))
+    match_by_pair = dict(zip(norm_pairs, find_results(norm_pairs, candidates)))
+
     details = []
     summary = {site: {"total": 0, "correct": 0, "unmatched": 0} for site in SITES}
 
@@ -263,7 +342,9 @@ def main():
             away = pred["away_team"]
             prediction = pred["prediction"]
 
-            matched, best_score, best_api_home, best_api_away = find_result(home, away, results)
+            matched, best_score, best_api_home, best_api_away = match_by_pair[
+                (normalize(home), normalize(away))
+            ]
 
             if matched is None:
                 correct = "UNMATCHED"
@@ -304,9 +385,17 @@ def main():
 
     path = os.path.join(TMP_DIR, f"scores_{run_date}.json")
     os.makedirs(TMP_DIR, exist_ok=True)
-    with open(path, "w") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
     print(f"\nScores written to {path}")
+    return {"status": "ok", "error": None, "path": path}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--date", default=str(date.today()), help="Date in YYYY-MM-DD format")
+    args = parser.parse_args()
+    run(args.date)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+"""
+scrape_all.py — Run every site scraper concurrently against one shared browser
+
+Each scraper still opens its own context (predictz needs its stealth settings),
+but they share a single Chromium process, so its cold start is paid once and
+all sites' network I/O overlaps. The browser is only launched once a scraper
+actually needs a page (most are answered by a plain HTTP fetch). Each site
+runs under its own SITE_TIMEOUT and always ends with an output file.
+
+Sites: forebet, predictz, onemillion, vitibet, freesupertips
+Output: .tmp/predictions_{site}_{date}.json (written by each scraper)
+"""
+
+import asyncio
+from datetime import date
+
+import orjson
+from playwright.async_api import async_playwright
+
+import _scrape_common
+import scrape_forebet
+import scrape_freesupertips
+import scrape_onemillion
+import scrape_predictz
+import scrape_vitibet
+
+SCRAPERS = [scrape_forebet, scrape_predictz, scrape_onemillion, scrape_vitibet, scrape_freesupertips]
+
+# Per-site budget, kept below server.py's 300s STEP_TIMEOUT so one slow site is
+# cancelled (its page and context closed) and recorded as failed, rather than
+# the whole step timing out with every site unaccounted for.
+SITE_TIMEOUT = 240  # seconds
+
+
+async def scrape_site(module, browser, run_date):
+    """
+    Run one scraper under SITE_TIMEOUT. Any error that escapes it (timeout,
+    browser launch failure, ...) still gets a failed output file, so
+    update_sheet writes SCRAPE_FAILED rows for the site.
+    """
+    try:
+        return await asyncio.wait_for(module.scrape(browser, run_date), SITE_TIMEOUT)
+    except Exception as e:
+        error = f"Timed out after {SITE_TIMEOUT}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+        print(f"[{module.SITE}] ERROR: {error}")
+        path = _scrape_common.write_output(module.SITE, run_date, [], error=error)
+        return {"status": "failed", "error": error, "path": path}
+
+
+async def scrape_all(run_date=None):
+    """Return {site: status dict} for every scraper, sharing one browser."""
+    run_date = run_date or str(date.today())
+
+    async with async_playwright() as p:
+        browser = _scrape_common.LazyBrowser(p, scrape_predictz.LAUNCH_ARGS)
+        try:
+            outcomes = await asyncio.gather(
+                *(scrape_site(module, browser, run_date) for module in SCRAPERS)
+            )
+        finally:
+            await browser.close()
+
+    return {module.SITE: outcome for module, outcome in zip(SCRAPERS, outcomes)}
+
+
+def site_statuses(run_date):
+    """
+    {site: {"status", "error"}} read back from each scraper's output file,
+    with status "missing" for a site that wrote none. Used by server.py to
+    show every site in the morning response.
+    """
+    statuses = {}
+    for module in SCRAPERS:
+        try:
+            with open(_scrape_common.output_path(module.SITE, run_date), "rb") as f:
+                data = orjson.loads(f.read())
+            statuses[module.SITE] = {"status": data.get("status"), "error": data.get("error")}
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            statuses[module.SITE] = {"status": "missing", "error": None}
+    return statuses
+
+
+def run(run_date=None):
+    """
+    In-process entry point used by server.py.
+    Status is "ok" if at least one site scraped — a single site failing is
+    expected and already recorded in that site's output file.
+    """
+    results = asyncio.run(scrape_all(run_date))
+    for site, result in results.items():
+        print(f"[scrape_all] {site} → {result['status']}")
+    ok = any(result["status"] == "ok" for result in results.values())
+    return {"status": "ok" if ok else "failed", "sites": results}
+
+
+if __name__ == "__main__":
+    run()
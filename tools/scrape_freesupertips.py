@@ -1,10 +1,10 @@
 """
-scrape_freesupertips.py — Scrape top 5 1X2 football predictions from freesupertips.com
+scrape_freesupertips.py — Scrape the top MAX_PREDICTIONS 1X2 predictions from freesupertips.com
 
 The listing page groups predictions by league section (H2 headings). We scroll
 the full page to trigger any lazy-loaded sections, then pick the first prediction
 from each section to get variety across competitions. We keep collecting until
-we have 5 or exhaust all available matches.
+we have MAX_PREDICTIONS (from _scrape_common) or exhaust all available matches.
 
 Each match link leads to a detail page where the main prediction is in:
     div.IndividualTipPrediction > h4
@@ -18,16 +18,23 @@ Output: .tmp/predictions_freesupertips_{date}.json
 """
 
 import asyncio
-import json
-import os
+import functools
+import re
+import sys
 from datetime import date
 
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+import _scrape_common
 
 SITE = "freesupertips"
 LISTING_URL = "https://www.freesupertips.com/predictions/"
 BASE_URL = "https://www.freesupertips.com"
 
+# Detail pages are fetched in batches of this size; the next batch is only
+# opened if the previous ones didn't yield MAX_PREDICTIONS valid picks.
+DETAIL_CONCURRENCY = 5
+
 # Section heading substrings that indicate leagues not covered by football-data.org free API.
 # If a match's section heading contains any of these (case-insensitive), it is skipped.
 SKIP_SECTIONS = {
@@ -66,25 +73,6 @@ KNOWN_NON_API_CLUBS = {
     "pachuca", "santos laguna", "toluca",
 }
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-TMP_DIR = os.path.join(BASE_DIR, ".tmp")
-
-
-def write_output(run_date, predictions, error=None):
-    os.makedirs(TMP_DIR, exist_ok=True)
-    output = {
-        "date": run_date,
-        "site": SITE,
-        "status": "ok" if not error else "failed",
-        "error": error,
-        "predictions": predictions,
-    }
-    path = os.path.join(TMP_DIR, f"predictions_{SITE}_{run_date}.json")
-    with open(path, "w") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
-    return path
-
-
 NON_1X2_PATTERNS = [
     "both teams to score", "btts",
     "over ", "under ",
@@ -96,14 +84,13 @@ NON_1X2_PATTERNS = [
     "total goals",
 ]
 
+# All patterns in one alternation: a single scan per tip instead of one per pattern
+NON_1X2_RE = re.compile("|".join(re.escape(p) for p in NON_1X2_PATTERNS))
+
 
 def is_1x2_tip(tip_text):
     """Return True if the tip looks like a 1X2 prediction, False for BTTS/goals/etc."""
-    t = tip_text.strip().lower()
-    for pattern in NON_1X2_PATTERNS:
-        if pattern in t:
-            return False
-    return True
+    return NON_1X2_RE.search(tip_text.strip().lower()) is None
 
 
 def extract_1x2_component(tip_text):
@@ -120,21 +107,27 @@ def extract_1x2_component(tip_text):
     return None
 
 
-def parse_prediction(tip_text, home_team, away_team):
+def team_words(team):
+    """
+    Lowercased word set for a team name, as parse_prediction expects it.
+    Words are interned: the same team recurs across links and its tokens
+    hash and compare by identity.
+    """
+    return frozenset(sys.intern(word) for word in team.lower().split())
+
+
+@functools.lru_cache(maxsize=256)
+def parse_prediction(tip_text, home_words, away_words):
     """
     Convert tip text like "Atalanta to Win" or "Draw" to 1/X/2.
-    Uses case-insensitive partial matching against team names.
+    Uses case-insensitive partial matching against the teams' team_words().
+    Memoized: the word sets are frozensets, so the arguments are hashable.
     """
     t = tip_text.strip().lower()
 
     if "draw" in t:
         return "X"
 
-    home_lower = home_team.lower()
-    away_lower = away_team.lower()
-
-    home_words = set(home_lower.split())
-    away_words = set(away_lower.split())
     tip_words = set(t.split())
 
     home_overlap = home_words & tip_words
@@ -146,9 +139,9 @@ def parse_prediction(tip_text, home_team, away_team):
         return "2"
 
     # Fallback: substring match on significant words
-    if any(word in t for word in home_lower.split() if len(word) > 3):
+    if any(word in t for word in home_words if len(word) > 3):
         return "1"
-    if any(word in t for word in away_lower.split() if len(word) > 3):
+    if any(word in t for word in away_words if len(word) > 3):
         return "2"
 
     return None
@@ -168,6 +161,18 @@ async def scroll_page_fully(page):
     await page.wait_for_timeout(300)
 
 
+def match_link(item, url, section):
+    """Link dict for one listing entry, with the team word sets precomputed."""
+    return {
+        "home": item["home"],
+        "away": item["away"],
+        "url": url,
+        "section": section,
+        "home_words": team_words(item["home"]),
+        "away_words": team_words(item["away"]),
+    }
+
+
 async def get_match_links(page):
     """
     Extract match links grouped by league section (H2/H3/H4 headings).
@@ -229,19 +234,19 @@ async def get_match_links(page):
             href = item["href"]
             url = href if href.startswith("http") else BASE_URL + href
             if url not in seen_urls:
-                links.append({"home": item["home"], "away": item["away"], "url": url, "section": section})
+                links.append(match_link(item, url, section))
                 seen_urls.add(url)
                 break  # one per section in pass 1
 
     # Pass 2: fill remaining slots with second+ matches from each section
     for section in group_order:
-        if len(links) >= 10:  # generous cap — caller stops at 5
+        if len(links) >= 10:  # generous cap — caller stops at MAX_PREDICTIONS
             break
         for item in groups[section][1:]:
             href = item["href"]
             url = href if href.startswith("http") else BASE_URL + href
             if url not in seen_urls:
-                links.append({"home": item["home"], "away": item["away"], "url": url, "section": section})
+                links.append(match_link(item, url, section))
                 seen_urls.add(url)
 
     return links
@@ -255,125 +260,128 @@ async def get_match_tip(context, url):
     page = await context.new_page()
     try:
         await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-        await page.wait_for_timeout(2000)
-        tip_el = await page.query_selector("div.IndividualTipPrediction h4")
-        if tip_el:
-            return (await tip_el.inner_text()).strip()
-        return None
+        try:
+            tip_el = await page.wait_for_selector("div.IndividualTipPrediction h4", timeout=15000)
+        except PlaywrightTimeoutError:
+            return None
+        return (await tip_el.inner_text()).strip()
     finally:
         await page.close()
 
 
-async def scrape():
-    run_date = str(date.today())
+def tip_to_prediction(match, tip):
+    """Prediction dict for a match's detail-page tip, or None (with the reason printed)."""
+    section = match.get("section", "")
+
+    if isinstance(tip, Exception):
+        print(f"  [{SITE}] Error processing {match.get('home', '?')} vs {match.get('away', '?')}: {tip}")
+        return None
+    if not tip:
+        print(f"  [{SITE}] No tip found for {match['home']} vs {match['away']}, skipping")
+        return None
+
+    effective_tip = tip
+    if not is_1x2_tip(tip):
+        # Try to salvage a 1X2 component from compound tips
+        effective_tip = extract_1x2_component(tip)
+        if effective_tip:
+            print(f"  [{SITE}] Compound tip '{tip}' → using 1X2 part '{effective_tip}'")
+        else:
+            print(f"  [{SITE}] Skipping non-1X2 tip '{tip}' for {match['home']} vs {match['away']}")
+            return None
+
+    prediction = parse_prediction(effective_tip, match["home_words"], match["away_words"])
+    if not prediction:
+        print(f"  [{SITE}] Could not parse tip '{effective_tip}' for {match['home']} vs {match['away']}, skipping")
+        return None
+
+    print(f"  [{SITE}] [{section}] {match['home']} vs {match['away']} → {prediction} (tip: {tip})")
+    return {
+        "home_team": match["home"],
+        "away_team": match["away"],
+        "prediction": prediction,
+    }
+
+
+async def scrape(browser, run_date=None):
+    run_date = run_date or str(date.today())
     print(f"[{SITE}] Scraping {LISTING_URL} for {run_date} ...")
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            )
-        )
-        page = await context.new_page()
+    context = await _scrape_common.new_context(browser, SITE)
+    page = await context.new_page()
 
+    try:
+        await page.goto(LISTING_URL, wait_until="domcontentloaded", timeout=30000)
         try:
-            await page.goto(LISTING_URL, wait_until="domcontentloaded", timeout=30000)
-            await page.wait_for_timeout(2000)
+            await page.wait_for_selector("a.Prediction", timeout=15000)
+        except PlaywrightTimeoutError:
+            pass  # get_match_links finds nothing and raises below
+
+        match_links = await get_match_links(page)
+
+        if not match_links:
+            raise ValueError("No match links found on listing page")
+
+        print(f"[{SITE}] Processing {len(match_links)} candidate match(es)...")
+
+        candidates = []
+        for match in match_links:
+            section = match.get("section", "")
+
+            # Skip matches from leagues not covered by football-data.org free API
+            section_lower = section.lower()
+            if any(skip in section_lower for skip in SKIP_SECTIONS):
+                print(f"  [{SITE}] Skipping {match['home']} vs {match['away']} — uncovered league ({section})")
+                continue
+
+            # Fallback: skip if either team is a known non-API club
+            home_lower = match["home"].lower()
+            away_lower = match["away"].lower()
+            if any(club in home_lower or club in away_lower for club in KNOWN_NON_API_CLUBS):
+                print(f"  [{SITE}] Skipping {match['home']} vs {match['away']} — known non-API club (section='{section}')")
+                continue
+
+            candidates.append(match)
+
+        # Fetch detail pages a batch at a time and consume each batch's tips
+        # in listing order, so the picks match a serial walk; stop as soon as
+        # enough valid picks are in rather than loading every candidate.
+        predictions = []
+        for start in range(0, len(candidates), DETAIL_CONCURRENCY):
+            batch = candidates[start:start + DETAIL_CONCURRENCY]
+            tips = await asyncio.gather(
+                *(get_match_tip(context, match["url"]) for match in batch),
+                return_exceptions=True,
+            )
+            for match, tip in zip(batch, tips):
+                prediction = tip_to_prediction(match, tip)
+                if prediction:
+                    predictions.append(prediction)
+                if len(predictions) >= _scrape_common.MAX_PREDICTIONS:
+                    break
+            if len(predictions) >= _scrape_common.MAX_PREDICTIONS:
+                break
 
-            match_links = await get_match_links(page)
+        if 0 < len(predictions) < _scrape_common.MAX_PREDICTIONS:
+            print(f"[{SITE}] WARNING: Only {len(predictions)}/{_scrape_common.MAX_PREDICTIONS} valid 1X2 predictions found — site may have fewer listings today")
 
-            if not match_links:
-                raise ValueError("No match links found on listing page")
+        if not predictions:
+            raise await _scrape_common.no_predictions_error(page, SITE, run_date)
 
-            print(f"[{SITE}] Processing {len(match_links)} candidate match(es)...")
+        await _scrape_common.save_state(context, SITE)
+        return _scrape_common.succeed(SITE, run_date, predictions)
 
-            predictions = []
-            for match in match_links:
-                if len(predictions) >= 5:
-                    break
-                section = match.get("section", "")
-
-                # Skip matches from leagues not covered by football-data.org free API
-                section_lower = section.lower()
-                if any(skip in section_lower for skip in SKIP_SECTIONS):
-                    print(f"  [{SITE}] Skipping {match['home']} vs {match['away']} — uncovered league ({section})")
-                    continue
-
-                # Fallback: skip if either team is a known non-API club
-                home_lower = match["home"].lower()
-                away_lower = match["away"].lower()
-                if any(club in home_lower or club in away_lower for club in KNOWN_NON_API_CLUBS):
-                    print(f"  [{SITE}] Skipping {match['home']} vs {match['away']} — known non-API club (section='{section}')")
-                    continue
-
-                try:
-                    tip = await get_match_tip(context, match["url"])
-                    if not tip:
-                        print(f"  [{SITE}] No tip found for {match['home']} vs {match['away']}, skipping")
-                        continue
-
-                    effective_tip = tip
-                    if not is_1x2_tip(tip):
-                        # Try to salvage a 1X2 component from compound tips
-                        effective_tip = extract_1x2_component(tip)
-                        if effective_tip:
-                            print(f"  [{SITE}] Compound tip '{tip}' → using 1X2 part '{effective_tip}'")
-                        else:
-                            print(f"  [{SITE}] Skipping non-1X2 tip '{tip}' for {match['home']} vs {match['away']}")
-                            continue
-
-                    prediction = parse_prediction(effective_tip, match["home"], match["away"])
-                    if not prediction:
-                        print(f"  [{SITE}] Could not parse tip '{effective_tip}' for {match['home']} vs {match['away']}, skipping")
-                        continue
-
-                    predictions.append({
-                        "home_team": match["home"],
-                        "away_team": match["away"],
-                        "prediction": prediction,
-                    })
-                    print(f"  [{SITE}] [{section}] {match['home']} vs {match['away']} → {prediction} (tip: {tip})")
-
-                except Exception as e:
-                    print(f"  [{SITE}] Error processing {match.get('home', '?')} vs {match.get('away', '?')}: {e}")
-                    continue
-
-            if 0 < len(predictions) < 5:
-                print(f"[{SITE}] WARNING: Only {len(predictions)}/5 valid 1X2 predictions found — site may have fewer listings today")
-
-            if not predictions:
-                html_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.html")
-                with open(html_path, "w") as f:
-                    f.write(await page.content())
-                screenshot_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.png")
-                await page.screenshot(path=screenshot_path, full_page=True)
-                raise ValueError(
-                    f"No predictions extracted. Debug files:\n"
-                    f"  Screenshot: {screenshot_path}\n  HTML: {html_path}"
-                )
-
-            print(f"[{SITE}] Extracted {len(predictions)} predictions")
-            path = write_output(run_date, predictions[:5])
-            print(f"[{SITE}] Output: {path}")
-
-        except Exception as e:
-            error_msg = str(e)
-            print(f"[{SITE}] ERROR: {error_msg}")
-            screenshot_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.png")
-            try:
-                await page.screenshot(path=screenshot_path, full_page=True)
-                print(f"[{SITE}] Debug screenshot: {screenshot_path}")
-            except Exception:
-                pass
-            path = write_output(run_date, [], error=error_msg)
-            print(f"[{SITE}] Failed output written to {path}")
-
-        finally:
-            await browser.close()
+    except Exception as e:
+        return await _scrape_common.fail(page, SITE, run_date, str(e))
+
+    finally:
+        await context.close()
+
+
+def run(run_date=None):
+    """Standalone entry point. Returns a status dict."""
+    return asyncio.run(_scrape_common.run_standalone(scrape, run_date))
 
 
 if __name__ == "__main__":
-    asyncio.run(scrape())
+    run()
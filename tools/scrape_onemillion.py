@@ -10,32 +10,14 @@ Output: .tmp/predictions_onemillion_{date}.json
 """
 
 import asyncio
-import json
-import os
-from datetime import date
 
-from playwright.async_api import async_playwright
+from selectolax.lexbor import LexborHTMLParser
+
+import _scrape_common
 
 SITE = "onemillion"
 URL = "https://onemillionpredictions.com/"
-
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-TMP_DIR = os.path.join(BASE_DIR, ".tmp")
-
-
-def write_output(run_date, predictions, error=None):
-    os.makedirs(TMP_DIR, exist_ok=True)
-    output = {
-        "date": run_date,
-        "site": SITE,
-        "status": "ok" if not error else "failed",
-        "error": error,
-        "predictions": predictions,
-    }
-    path = os.path.join(TMP_DIR, f"predictions_{SITE}_{run_date}.json")
-    with open(path, "w") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
-    return path
+WAIT_SELECTOR = "td.ninja_clmn_nm_1"
 
 
 def pick_from_odds(odds_1, odds_x, odds_2):
@@ -53,60 +35,11 @@ def pick_from_odds(odds_1, odds_x, odds_2):
         return None
 
 
-async def scrape():
-    run_date = str(date.today())
-    print(f"[{SITE}] Scraping {URL} for {run_date} ...")
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            )
-        )
-        page = await context.new_page()
-
-        try:
-            await page.goto(URL, wait_until="domcontentloaded", timeout=30000)
-            await page.wait_for_timeout(2000)
-
-            predictions = await extract_predictions(page)
-
-            if not predictions:
-                html_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.html")
-                with open(html_path, "w") as f:
-                    f.write(await page.content())
-                screenshot_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.png")
-                await page.screenshot(path=screenshot_path, full_page=True)
-                raise ValueError(
-                    f"No predictions extracted. Debug files saved:\n"
-                    f"  Screenshot: {screenshot_path}\n"
-                    f"  HTML: {html_path}"
-                )
-
-            print(f"[{SITE}] Extracted {len(predictions)} predictions")
-            path = write_output(run_date, predictions[:5])
-            print(f"[{SITE}] Output: {path}")
-
-        except Exception as e:
-            error_msg = str(e)
-            print(f"[{SITE}] ERROR: {error_msg}")
-            screenshot_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.png")
-            try:
-                await page.screenshot(path=screenshot_path, full_page=True)
-                print(f"[{SITE}] Debug screenshot: {screenshot_path}")
-            except Exception:
-                pass
-            path = write_output(run_date, [], error=error_msg)
-            print(f"[{SITE}] Failed output written to {path}")
-
-        finally:
-            await browser.close()
-
-
-async def extract_predictions(page):
+async def scrape(browser, run_date=None):
+    return await _scrape_common.scrape_site(browser, SITE, URL, parse_html, WAIT_SELECTOR, run_date)
+
+
+def parse_html(html):
     """
     The site renders a Ninja Table with CSS classes:
       ninja_clmn_nm_teams  — teams cell (home<br/>away)
@@ -116,30 +49,33 @@ async def extract_predictions(page):
 
     Prediction = column with the lowest odds.
     """
-    predictions = []
+    return rows_to_predictions(iter_rows(html))
 
-    rows = await page.query_selector_all("table tr")
-    for row in rows:
-        teams_cell = await row.query_selector("td.ninja_clmn_nm_teams")
-        cell_1 = await row.query_selector("td.ninja_clmn_nm_1")
-        cell_x = await row.query_selector("td.ninja_clmn_nm_x")
-        cell_2 = await row.query_selector("td.ninja_clmn_nm_2")
 
-        if not teams_cell or not cell_1 or not cell_x or not cell_2:
+def iter_rows(html):
+    """Yield the raw cell texts of each prediction row, in page order."""
+    for row in LexborHTMLParser(html).css("table tr"):
+        teams = row.css_first("td.ninja_clmn_nm_teams")
+        cells = [row.css_first(f"td.ninja_clmn_nm_{col}") for col in ("1", "x", "2")]
+        if not teams or not all(cells):
             continue
+        # Join text nodes with newlines so the <br/> between teams survives
+        yield {"teams": teams.text(separator="\n"), "odds": [c.text() for c in cells]}
+
 
-        # Teams are separated by <br/> — get_text with separator preserves it
-        teams_text = await teams_cell.inner_text()
-        teams = [t.strip() for t in teams_text.strip().splitlines() if t.strip()]
+def rows_to_predictions(rows):
+    """Turn raw {teams, odds} cell texts into prediction dicts."""
+    predictions = []
+    for row in rows:
+        # Teams are separated by <br/>, which parse_html turns into a newline
+        teams = [t.strip() for t in row["teams"].strip().splitlines() if t.strip()]
         if len(teams) < 2:
             continue
 
         home_team = teams[0]
         away_team = teams[1]
 
-        odds_1 = (await cell_1.inner_text()).strip()
-        odds_x = (await cell_x.inner_text()).strip()
-        odds_2 = (await cell_2.inner_text()).strip()
+        odds_1, odds_x, odds_2 = (o.strip() for o in row["odds"])
 
         # Skip league-separator rows (no numeric odds)
         if not any(o.replace(".", "").isdigit() for o in [odds_1, odds_x, odds_2]):
@@ -154,9 +90,16 @@ async def extract_predictions(page):
             "away_team": away_team,
             "prediction": prediction,
         })
+        if len(predictions) == _scrape_common.MAX_PREDICTIONS:
+            break  # only the top picks are kept, so stop walking the rows
 
     return predictions
 
 
+def run(run_date=None):
+    """Standalone entry point. Returns a status dict."""
+    return asyncio.run(_scrape_common.run_standalone(scrape, run_date))
+
+
 if __name__ == "__main__":
-    asyncio.run(scrape())
+    run()
@@ -9,11 +9,10 @@ Output: .tmp/predictions_predictz_{date}.json
 """
 
 import asyncio
-import json
-import os
-from datetime import date
 
-from playwright.async_api import async_playwright
+from selectolax.lexbor import LexborHTMLParser
+
+import _scrape_common
 
 SITE = "predictz"
 URL = "https://www.predictz.com/"
@@ -51,23 +50,52 @@ KNOWN_NON_API_CLUBS = {
     "leon", "pachuca", "santos laguna", "toluca",
 }
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-TMP_DIR = os.path.join(BASE_DIR, ".tmp")
+# Chromium flags that hide the most obvious automation fingerprints.
+# scrape_all.py launches the shared browser with these too.
+LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-infobars",
+    "--window-size=1280,900",
+]
+
+# Comprehensive stealth init script — hides common automation fingerprints
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+    Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
+    Object.defineProperty(navigator, 'languages', {get: () => ['en-GB', 'en']});
+    window.chrome = {runtime: {}, loadTimes: function(){}, csi: function(){}, app: {}};
+    const origQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (p) =>
+        p.name === 'notifications'
+            ? Promise.resolve({state: Notification.permission})
+            : origQuery(p);
+"""
 
+CONTEXT_OPTIONS = {
+    "user_agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/131.0.0.0 Safari/537.36"
+    ),
+    "viewport": {"width": 1280, "height": 900},
+    "locale": "en-GB",
+    "timezone_id": "Europe/London",
+    "extra_http_headers": {
+        "Accept-Language": "en-GB,en;q=0.9",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+    },
+}
 
-def write_output(run_date, predictions, error=None):
-    os.makedirs(TMP_DIR, exist_ok=True)
-    output = {
-        "date": run_date,
-        "site": SITE,
-        "status": "ok" if not error else "failed",
-        "error": error,
-        "predictions": predictions,
-    }
-    path = os.path.join(TMP_DIR, f"predictions_{SITE}_{run_date}.json")
-    with open(path, "w") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
-    return path
+# The static GET presents the same browser identity. The stealth launch flags,
+# context and init script above only come into play if it gets a challenge
+# page instead of the match rows.
+HTTP_HEADERS = {
+    "User-Agent": CONTEXT_OPTIONS["user_agent"],
+    **CONTEXT_OPTIONS["extra_http_headers"],
+}
 
 
 def badge_to_prediction(badge_text):
@@ -82,98 +110,15 @@ def badge_to_prediction(badge_text):
     return None
 
 
-async def scrape():
-    run_date = str(date.today())
-    print(f"[{SITE}] Scraping {URL} for {run_date} ...")
-
-    # Comprehensive stealth init script — hides common automation fingerprints
-    STEALTH_SCRIPT = """
-        Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-        Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
-        Object.defineProperty(navigator, 'languages', {get: () => ['en-GB', 'en']});
-        window.chrome = {runtime: {}, loadTimes: function(){}, csi: function(){}, app: {}};
-        const origQuery = window.navigator.permissions.query;
-        window.navigator.permissions.query = (p) =>
-            p.name === 'notifications'
-                ? Promise.resolve({state: Notification.permission})
-                : origQuery(p);
-    """
+async def scrape(browser, run_date=None):
+    return await _scrape_common.scrape_site(
+        browser, SITE, URL, parse_html, "tr.pzcnt", run_date,
+        context_options=CONTEXT_OPTIONS, init_script=STEALTH_SCRIPT, goto_timeout=45000,
+        http_headers=HTTP_HEADERS,
+    )
+
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--disable-dev-shm-usage",
-                "--no-sandbox",
-                "--disable-setuid-sandbox",
-                "--disable-infobars",
-                "--window-size=1280,900",
-            ],
-        )
-        context = await browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/131.0.0.0 Safari/537.36"
-            ),
-            viewport={"width": 1280, "height": 900},
-            locale="en-GB",
-            timezone_id="Europe/London",
-            extra_http_headers={
-                "Accept-Language": "en-GB,en;q=0.9",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-            },
-        )
-        await context.add_init_script(STEALTH_SCRIPT)
-        page = await context.new_page()
-
-        try:
-            await page.goto(URL, wait_until="domcontentloaded", timeout=60000)
-            # Wait for match rows to appear, fall back to networkidle then fixed delay
-            try:
-                await page.wait_for_selector("tr.pzcnt", timeout=15000)
-            except Exception:
-                try:
-                    await page.wait_for_load_state("networkidle", timeout=10000)
-                except Exception:
-                    pass
-                await page.wait_for_timeout(3000)
-
-            predictions = await extract_predictions(page)
-
-            if not predictions:
-                html_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.html")
-                with open(html_path, "w") as f:
-                    f.write(await page.content())
-                screenshot_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.png")
-                await page.screenshot(path=screenshot_path, full_page=True)
-                raise ValueError(
-                    f"No predictions extracted. Debug files:\n"
-                    f"  Screenshot: {screenshot_path}\n  HTML: {html_path}"
-                )
-
-            print(f"[{SITE}] Extracted {len(predictions)} predictions")
-            path = write_output(run_date, predictions[:5])
-            print(f"[{SITE}] Output: {path}")
-
-        except Exception as e:
-            error_msg = str(e)
-            print(f"[{SITE}] ERROR: {error_msg}")
-            screenshot_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.png")
-            try:
-                await page.screenshot(path=screenshot_path, full_page=True)
-                print(f"[{SITE}] Debug screenshot: {screenshot_path}")
-            except Exception:
-                pass
-            path = write_output(run_date, [], error=error_msg)
-            print(f"[{SITE}] Failed output written to {path}")
-
-        finally:
-            await browser.close()
-
-
-async def extract_predictions(page):
+def parse_html(html):
     """
     Target: tr.pzcnt rows that contain a div.neonboxvsml badge.
     Row structure: [Match Name] [Predicted Score] [H/D/A badge] [View Tip]
@@ -182,34 +127,31 @@ async def extract_predictions(page):
     We walk all <tr> elements in DOM order to track competition section headings
     (non-pzcnt rows with short text and no " v ") so we can skip uncovered leagues.
     """
-    # Walk all tr elements in order to capture competition heading context
-    raw_items = await page.evaluate("""() => {
-        const items = [];
-        let currentSection = '';
-
-        document.querySelectorAll('tr').forEach(tr => {
-            if (tr.classList.contains('pzcnt')) {
-                const badge = tr.querySelector('div.neonboxvsml');
-                if (!badge) return;
-                const cells = tr.querySelectorAll('td');
-                if (!cells.length) return;
-                items.push({
-                    matchText: cells[0].textContent.trim(),
-                    badgeText: badge.textContent.trim(),
-                    section: currentSection,
-                });
-            } else {
-                // Potential competition header row: short text, no " v " separator
-                const text = tr.textContent.trim().split('\\n')[0].trim();
-                if (text.length > 2 && text.length < 70 && !text.includes(' v ')) {
-                    currentSection = text;
-                }
+    return items_to_predictions(iter_items(html))
+
+
+def iter_items(html):
+    """Yield raw {matchText, badgeText, section} per badge row, in page order."""
+    current_section = ""
+    for tr in LexborHTMLParser(html).css("tr"):
+        if "pzcnt" in (tr.attributes.get("class") or "").split():
+            badge = tr.css_first("div.neonboxvsml")
+            cells = tr.css("td")
+            if not badge or not cells:
+                continue
+            yield {
+                "matchText": cells[0].text().strip(),
+                "badgeText": badge.text().strip(),
+                "section": current_section,
             }
-        });
+        else:
+            text = tr.text().strip().split("\n")[0].strip()
+            if 2 < len(text) < 70 and " v " not in text:
+                current_section = text
 
-        return items;
-    }""")
 
+def items_to_predictions(raw_items):
+    """Filter raw {matchText, badgeText, section} rows into prediction dicts."""
     predictions = []
     for item in raw_items:
         match_text = item.get("matchText", "")
@@ -248,9 +190,16 @@ async def extract_predictions(page):
             "prediction": prediction,
         })
         print(f"  [{SITE}] [{section}] {home_team} vs {away_team} → {prediction}")
+        if len(predictions) == _scrape_common.MAX_PREDICTIONS:
+            break  # only the top picks are kept, so stop walking the rows
 
     return predictions
 
 
+def run(run_date=None):
+    """Standalone entry point. Returns a status dict."""
+    return asyncio.run(_scrape_common.run_standalone(scrape, run_date, LAUNCH_ARGS))
+
+
 if __name__ == "__main__":
-    asyncio.run(scrape())
+    run()
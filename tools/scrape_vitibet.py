@@ -15,32 +15,27 @@ Output: .tmp/predictions_vitibet_{date}.json
 """
 
 import asyncio
-import json
-import os
 from datetime import date
 
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from selectolax.lexbor import LexborHTMLParser
+
+import _http_scrape
+import _scrape_common
 
 SITE = "vitibet"
 URL = "https://www.vitibet.com/index.php?clanek=quicktips&sekce=fotbal&lang=en"
+TIP_SELECTOR = "td[class*='barvapodtipek']"
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-TMP_DIR = os.path.join(BASE_DIR, ".tmp")
-
-
-def write_output(run_date, predictions, error=None):
-    os.makedirs(TMP_DIR, exist_ok=True)
-    output = {
-        "date": run_date,
-        "site": SITE,
-        "status": "ok" if not error else "failed",
-        "error": error,
-        "predictions": predictions,
-    }
-    path = os.path.join(TMP_DIR, f"predictions_{SITE}_{run_date}.json")
-    with open(path, "w") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
-    return path
+TIP_PREDICTIONS = {
+    "barvapodtipek1":  "1",
+    "barvapodtipek2":  "2",
+    "barvapodtipek0":  "X",
+    "barvapodtipekx":  "X",
+    "barvapodtipekX":  "X",
+    "barvapodtipek10": "1",  # home win or draw → lean home
+    "barvapodtipek02": "2",  # draw or away → lean away
+}
 
 
 def tip_class_to_prediction(classes):
@@ -48,72 +43,51 @@ def tip_class_to_prediction(classes):
     Parse barvapodtipek* CSS class to 1/X/2.
     vitibet uses: 1=home, 0=draw, 2=away, 10=home+draw, 02=draw+away
     """
-    for cls in (classes or []):
-        if cls.startswith("barvapodtipek"):
-            suffix = cls.replace("barvapodtipek", "")
-            if suffix == "1":
-                return "1"
-            if suffix == "2":
-                return "2"
-            if suffix in ("0", "x", "X"):
-                return "X"
-            if suffix == "10":
-                return "1"   # home win or draw → lean home
-            if suffix == "02":
-                return "2"   # draw or away → lean away
-    return None
-
-
-async def scrape():
-    run_date = str(date.today())
-    print(f"[{SITE}] Scraping {URL} for {run_date} ...")
+    return next((TIP_PREDICTIONS[cls] for cls in (classes or []) if cls in TIP_PREDICTIONS), None)
+
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            )
-        )
-        page = await context.new_page()
+async def scrape(browser, run_date=None):
+    run_date = run_date or str(date.today())
+    print(f"[{SITE}] Scraping {URL} for {run_date} ...")
 
+    # A rerun shortly after a successful scrape reuses that output as-is
+    path = _scrape_common.load_output(SITE, run_date)
+    if path:
+        print(f"[{SITE}] Cache hit — reusing {path}")
+        return {"status": "ok", "error": None, "path": path}
+
+    # The tip table is in the server-rendered HTML, so a plain GET normally
+    # suffices; the browser is only started if that yields nothing.
+    html = await _http_scrape.fetch_html(URL)
+    predictions = parse_html(html) if html else []
+    if predictions:
+        return _scrape_common.succeed(SITE, run_date, predictions, "static HTML")
+    print(f"[{SITE}] No rows in static HTML, falling back to Playwright")
+
+    # Same UA as before; the shared context also aborts image/font/media/
+    # stylesheet requests, which the tip table never needs
+    context = await _scrape_common.new_context(browser, SITE)
+    page = await context.new_page()
+
+    try:
+        await page.goto(URL, wait_until="domcontentloaded", timeout=30000)
         try:
-            await page.goto(URL, wait_until="domcontentloaded", timeout=30000)
-            await page.wait_for_timeout(2000)
-
-            predictions = await extract_predictions(page)
-
-            if not predictions:
-                html_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.html")
-                with open(html_path, "w") as f:
-                    f.write(await page.content())
-                screenshot_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.png")
-                await page.screenshot(path=screenshot_path, full_page=True)
-                raise ValueError(
-                    f"No predictions extracted. Debug files:\n"
-                    f"  Screenshot: {screenshot_path}\n  HTML: {html_path}"
-                )
-
-            print(f"[{SITE}] Extracted {len(predictions)} predictions")
-            path = write_output(run_date, predictions[:5])
-            print(f"[{SITE}] Output: {path}")
-
-        except Exception as e:
-            error_msg = str(e)
-            print(f"[{SITE}] ERROR: {error_msg}")
-            screenshot_path = os.path.join(TMP_DIR, f"debug_{SITE}_{run_date}.png")
-            try:
-                await page.screenshot(path=screenshot_path, full_page=True)
-                print(f"[{SITE}] Debug screenshot: {screenshot_path}")
-            except Exception:
-                pass
-            path = write_output(run_date, [], error=error_msg)
-            print(f"[{SITE}] Failed output written to {path}")
-
-        finally:
-            await browser.close()
+            await page.wait_for_selector(TIP_SELECTOR, state="attached", timeout=10000)
+        except PlaywrightTimeoutError:
+            pass  # extract_predictions finds nothing and the debug dump below kicks in
+
+        predictions = await extract_predictions(page)
+
+        if not predictions:
+            raise await _scrape_common.no_predictions_error(page, SITE, run_date)
+
+        return _scrape_common.succeed(SITE, run_date, predictions)
+
+    except Exception as e:
+        return await _scrape_common.fail(page, SITE, run_date, str(e))
+
+    finally:
+        await context.close()
 
 
 async def extract_predictions(page):
@@ -122,34 +96,57 @@ async def extract_predictions(page):
     Columns: date(0) | blank(1) | home_team(2) | away_team(3) | blank(4) | ...
     Tip cell: any td with class starting with 'barvapodtipek'
     """
-    predictions = []
-
-    rows = await page.query_selector_all("table tr")
-    for row in rows:
-        cells = await row.query_selector_all("td")
+    # One evaluate call walks the table in the renderer instead of a
+    # get_attribute/inner_text round trip per cell per row, and the tip cell
+    # is found by the native selector engine rather than a className scan.
+    rows = await page.evaluate("""(tipSelector) => {
+        const rows = [];
+        document.querySelectorAll('table tr').forEach(tr => {
+            const tip = tr.querySelector(tipSelector);
+            if (!tip) return;
+            const cells = tr.querySelectorAll('td');
+            if (cells.length < 4) return;
+            rows.push({
+                home: cells[2].innerText,
+                away: cells[3].innerText,
+                classes: tip.className.trim().split(/\\s+/),
+            });
+        });
+        return rows;
+    }""", TIP_SELECTOR)
+    return rows_to_predictions(rows)
+
+
+def parse_html(html):
+    """Same extraction as extract_predictions, on fetched HTML with no browser."""
+    rows = []
+    for tr in LexborHTMLParser(html).css("table tr"):
+        tip = tr.css_first(TIP_SELECTOR)
+        if not tip:
+            continue
+        cells = tr.css("td")
         if len(cells) < 4:
             continue
+        # Collapse whitespace the way the rendered innerText would
+        rows.append({
+            "home": " ".join(cells[2].text().split()),
+            "away": " ".join(cells[3].text().split()),
+            "classes": tip.attributes["class"].split(),
+        })
+    return rows_to_predictions(rows)
 
-        # Find the tip cell by class
-        tip_cell = None
-        tip_classes = None
-        for cell in cells:
-            classes = await cell.get_attribute("class")
-            if classes and "barvapodtipek" in classes:
-                tip_cell = cell
-                tip_classes = classes.split()
-                break
-
-        if not tip_cell:
-            continue
 
-        home_team = (await cells[2].inner_text()).strip()
-        away_team = (await cells[3].inner_text()).strip()
+def rows_to_predictions(rows):
+    """Turn raw {home, away, classes} rows into prediction dicts."""
+    predictions = []
+    for row in rows:
+        home_team = row["home"].strip()
+        away_team = row["away"].strip()
 
         if not home_team or not away_team:
             continue
 
-        prediction = tip_class_to_prediction(tip_classes)
+        prediction = tip_class_to_prediction(row["classes"])
         if not prediction:
             continue
 
@@ -162,5 +159,10 @@ async def extract_predictions(page):
     return predictions
 
 
+def run(run_date=None):
+    """Standalone entry point. Returns a status dict."""
+    return asyncio.run(_scrape_common.run_standalone(scrape, run_date))
+
+
 if __name__ == "__main__":
-    asyncio.run(scrape())
+    run()
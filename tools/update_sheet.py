@@ -16,13 +16,19 @@ Mode: results
 """
 
 import argparse
+import functools
 import json
 import os
 import sys
+import threading
 from datetime import date
 
+import httplib2
+import numpy as np
+import orjson
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 
@@ -36,6 +42,7 @@ PREDICTIONS_TAB = "Predictions"
 LEADERBOARD_TAB = "Leaderboard"
 
 SITES = ["forebet", "predictz", "onemillion", "vitibet", "freesupertips", "claude"]
+SITE_INDEX = {site: i for i, site in enumerate(SITES)}
 
 SITE_COLORS = {
     "forebet":       {"red": 0.788, "green": 0.875, "blue": 0.953},  # pastel blue
@@ -53,14 +60,52 @@ TMP_DIR = os.path.join(BASE_DIR, ".tmp")
 
 PREDICTIONS_HEADERS = ["Date", "Site", "Home Team", "Away Team", "Prediction", "Result", "Correct"]
 
+HTTP_TIMEOUT = 60  # seconds per Sheets API request
+
+
+class LockedHttp:
+    """
+    httplib2.Http with its requests serialized by a lock.
+
+    httplib2 is not thread-safe, but the cached Sheets client can be used from
+    several threads at once (a timed-out step still running in server.py, or
+    the morning and evening runs overlapping), so every request goes through
+    the lock. The keep-alive connection is still reused between requests.
+    """
+
+    def __init__(self, timeout=HTTP_TIMEOUT):
+        self._http = httplib2.Http(timeout=timeout)
+        self._lock = threading.Lock()
+
+    def request(self, *args, **kwargs):
+        with self._lock:
+            return self._http.request(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._http, name)
+
 
 # ---------------------------------------------------------------------------
 # Auth
 # ---------------------------------------------------------------------------
 
 def get_service():
+    """
+    Sheets client, built once and shared by every step of the process.
+    It is rebuilt only when the token source changes (GOOGLE_TOKEN_JSON or
+    token.json's mtime); the client refreshes an expiring token by itself.
+    """
+    try:
+        token_mtime = os.path.getmtime(TOKEN_FILE)
+    except OSError:
+        token_mtime = None
+    return _build_service(os.environ.get("GOOGLE_TOKEN_JSON"), token_mtime)
+
+
+@functools.lru_cache(maxsize=1)
+def _build_service(token_env, token_mtime):
+    """Authenticate and build the client; token_mtime only keys the cache."""
     creds = None
-    token_env = os.environ.get("GOOGLE_TOKEN_JSON")
     credentials_env = os.environ.get("GOOGLE_CREDENTIALS_JSON")
 
     if token_env:
@@ -82,40 +127,57 @@ def get_service():
             creds = flow.run_local_server(port=0)
             with open(TOKEN_FILE, "w") as f:
                 f.write(creds.to_json())
-    return build("sheets", "v4", credentials=creds)
+    return build("sheets", "v4", http=AuthorizedHttp(creds, http=LockedHttp()))
 
 
 # ---------------------------------------------------------------------------
 # Sheet helpers
 # ---------------------------------------------------------------------------
 
+# Tab title -> sheetId. Filled by the first lookup of a run (run() clears it),
+# so the Predictions, Leaderboard, Analysis and Parlay lookups share one
+# metadata read instead of fetching the spreadsheet each time.
+_sheet_ids = {}
+
+
 def get_or_create_tab(service, tab_name):
     """Return the sheet ID for tab_name, creating it if it doesn't exist."""
-    spreadsheet = service.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-    for sheet in spreadsheet.get("sheets", []):
-        if sheet["properties"]["title"] == tab_name:
-            return sheet["properties"]["sheetId"]
+    if tab_name not in _sheet_ids:
+        spreadsheet = service.spreadsheets().get(
+            spreadsheetId=SPREADSHEET_ID, fields="sheets.properties(sheetId,title)"
+        ).execute()
+        for sheet in spreadsheet.get("sheets", []):
+            _sheet_ids[sheet["properties"]["title"]] = sheet["properties"]["sheetId"]
+    if tab_name in _sheet_ids:
+        return _sheet_ids[tab_name]
     body = {"requests": [{"addSheet": {"properties": {"title": tab_name}}}]}
     resp = service.spreadsheets().batchUpdate(
         spreadsheetId=SPREADSHEET_ID, body=body
     ).execute()
     print(f"  Created tab '{tab_name}'")
-    return resp["replies"][0]["addSheet"]["properties"]["sheetId"]
+    _sheet_ids[tab_name] = resp["replies"][0]["addSheet"]["properties"]["sheetId"]
+    return _sheet_ids[tab_name]
 
 
-def ensure_headers(service, tab_name, headers):
-    """Write header row if the tab is empty."""
+def header_request(service, tab_name, sheet_id, headers):
+    """
+    Return an updateCells request writing the header row if the tab's first
+    row is empty, else None. A header edited by hand (or a data row sitting in
+    row 1) is left alone.
+    """
     result = service.spreadsheets().values().get(
         spreadsheetId=SPREADSHEET_ID, range=f"{tab_name}!A1:Z1"
     ).execute()
-    if not result.get("values"):
-        service.spreadsheets().values().update(
-            spreadsheetId=SPREADSHEET_ID,
-            range=f"{tab_name}!A1",
-            valueInputOption="RAW",
-            body={"values": [headers]},
-        ).execute()
-        print(f"  Headers written to '{tab_name}'")
+    if result.get("values"):
+        return None
+    print(f"  Headers will be written to '{tab_name}'")
+    return {
+        "updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+            "rows": [row_data(headers)],
+            "fields": "userEnteredValue",
+        }
+    }
 
 
 def read_tab(service, tab_name):
@@ -126,47 +188,19 @@ def read_tab(service, tab_name):
     return result.get("values", [])
 
 
-def apply_site_colors(service, sheet_id, site_row_ranges):
+def row_data(values, color=None):
     """
-    Apply pastel background colors to each site's rows.
-    site_row_ranges: list of (site, start_row_0idx, end_row_0idx) — end is exclusive.
+    Build updateCells RowData for one row of strings, with the row's pastel
+    background baked in so values and colours go out in the same request.
+    Empty strings become blank cells, as with valueInputOption=RAW.
     """
-    requests = []
-    for site, start, end in site_row_ranges:
-        color = SITE_COLORS.get(site)
-        if not color:
-            continue
-        requests.append({
-            "repeatCell": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "startRowIndex": start,
-                    "endRowIndex": end,
-                    "startColumnIndex": 0,
-                    "endColumnIndex": 7,
-                },
-                "cell": {
-                    "userEnteredFormat": {
-                        "backgroundColor": color,
-                    }
-                },
-                "fields": "userEnteredFormat.backgroundColor",
-            }
-        })
-    if not requests:
-        print("  [color] No color requests generated — site_row_ranges may be empty or all sites unknown")
-        return
-    if requests:
-        print(f"  [color] Sending {len(requests)} color request(s) to Sheets API")
-        try:
-            service.spreadsheets().batchUpdate(
-                spreadsheetId=SPREADSHEET_ID,
-                body={"requests": requests},
-            ).execute()
-            print(f"  [color] Colors applied for {len(requests)} site(s)")
-        except Exception as e:
-            print(f"  [color] batchUpdate failed: {e}")
-            raise
+    cells = []
+    for value in values:
+        cell = {"userEnteredValue": {"stringValue": value}} if value else {}
+        if color:
+            cell["userEnteredFormat"] = {"backgroundColor": color}
+        cells.append(cell)
+    return {"values": cells}
 
 
 # ---------------------------------------------------------------------------
@@ -175,29 +209,23 @@ def apply_site_colors(service, sheet_id, site_row_ranges):
 
 def mode_predictions(service, run_date):
     sheet_id = get_or_create_tab(service, PREDICTIONS_TAB)
-    ensure_headers(service, PREDICTIONS_TAB, PREDICTIONS_HEADERS)
+    header = header_request(service, PREDICTIONS_TAB, sheet_id, PREDICTIONS_HEADERS)
 
     rows_to_insert = []
-    site_row_ranges = []  # (site, start_0idx, end_0idx)
 
     for site in SITES:
         path = os.path.join(TMP_DIR, f"predictions_{site}_{run_date}.json")
-
-        if not os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                data = orjson.loads(f.read())
+        except FileNotFoundError:
             print(f"  [{site}] WARNING: file not found ({path}) — skipping")
             continue
 
-        with open(path) as f:
-            data = json.load(f)
-
-        # Row 0 = header, new rows start at index 1; accumulate from there
-        site_start = 1 + len(rows_to_insert)
-
         if data["status"] == "failed":
             print(f"  [{site}] SCRAPE_FAILED — {data.get('error', 'unknown error')}")
             for _ in range(5):
                 rows_to_insert.append([run_date, site, "SCRAPE_FAILED", "", "", "", ""])
-            site_row_ranges.append((site, site_start, site_start + 5))
         else:
             preds = data["predictions"][:5]
             for pred in preds:
@@ -210,7 +238,6 @@ def mode_predictions(service, run_date):
                     "",  # Result — filled in evening run
                     "",  # Correct — filled in evening run
                 ])
-            site_row_ranges.append((site, site_start, site_start + len(preds)))
             print(f"  [{site}] {len(data['predictions'])} predictions loaded")
 
     if not rows_to_insert:
@@ -219,38 +246,33 @@ def mode_predictions(service, run_date):
 
     num_new = len(rows_to_insert)
 
-    # Insert blank rows immediately after the header (index 1) so new data lands at top
+    # One request: header (empty tab only), blank rows opened right after the
+    # header so new data lands at top, then values + site colours into them.
+    requests = [header] if header else []
+    requests.append({
+        "insertDimension": {
+            "range": {
+                "sheetId": sheet_id,
+                "dimension": "ROWS",
+                "startIndex": 1,
+                "endIndex": 1 + num_new,
+            },
+            "inheritFromBefore": False,
+        }
+    })
+    requests.append({
+        "updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": 1, "columnIndex": 0},
+            "rows": [row_data(row, SITE_COLORS.get(row[1])) for row in rows_to_insert],
+            "fields": "userEnteredValue,userEnteredFormat.backgroundColor",
+        }
+    })
     service.spreadsheets().batchUpdate(
         spreadsheetId=SPREADSHEET_ID,
-        body={"requests": [{
-            "insertDimension": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "ROWS",
-                    "startIndex": 1,
-                    "endIndex": 1 + num_new,
-                },
-                "inheritFromBefore": False,
-            }
-        }]},
-    ).execute()
-
-    # Write data into the newly opened rows starting at A2
-    service.spreadsheets().values().update(
-        spreadsheetId=SPREADSHEET_ID,
-        range=f"{PREDICTIONS_TAB}!A2",
-        valueInputOption="RAW",
-        body={"values": rows_to_insert},
+        body={"requests": requests},
     ).execute()
     print(f"\nInserted {num_new} rows at top of '{PREDICTIONS_TAB}'")
 
-    print(f"[color] Calling apply_site_colors: sheet_id={sheet_id}, ranges={site_row_ranges}")
-    try:
-        apply_site_colors(service, sheet_id, site_row_ranges)
-        print("[color] apply_site_colors completed successfully")
-    except Exception as e:
-        print(f"[color] ERROR in apply_site_colors: {e}")
-
 
 # ---------------------------------------------------------------------------
 # Mode: results
@@ -258,14 +280,14 @@ def mode_predictions(service, run_date):
 
 def mode_results(service, run_date):
     scores_path = os.path.join(TMP_DIR, f"scores_{run_date}.json")
-    if not os.path.exists(scores_path):
+    try:
+        with open(scores_path, "rb") as f:
+            scores_data = orjson.loads(f.read())
+    except FileNotFoundError:
         print(f"ERROR: scores file not found: {scores_path}")
         print("Run score_predictions.py first.")
         sys.exit(1)
 
-    with open(scores_path) as f:
-        scores_data = json.load(f)
-
     details = scores_data.get("details", [])
     if not details:
         print("WARNING: scores file has no details — nothing to update")
@@ -279,42 +301,50 @@ def mode_results(service, run_date):
     # Build lookup: (date, site, home_team, away_team) -> 1-based sheet row number
     # Header is row 1, data starts at row 2
     lookup = {}
-    for i, row in enumerate(all_rows):
-        if i == 0:
-            continue  # skip header
-        if len(row) < 4:
-            continue
-        key = (row[0], row[1], row[2], row[3])
-        if key not in lookup:  # keep first occurrence
-            lookup[key] = i + 1  # 1-based
+    for row_num, row in enumerate(all_rows[1:], start=2):  # skip header
+        if len(row) >= 4:
+            lookup.setdefault((row[0], row[1], row[2], row[3]), row_num)  # keep first occurrence
 
-    # Build batch update for Result (col F) and Correct (col G)
-    updates = []
-    matched = 0
+    # Patch Result (col F) and Correct (col G) into the rows already read;
+    # all_rows then doubles as the source for the sheet write and the leaderboard
+    updated_rows = []
     for detail in details:
         key = (run_date, detail["site"], detail["home_team"], detail["away_team"])
         row_num = lookup.get(key)
         if row_num is None:
             print(f"  WARNING: no sheet row found for {key}")
             continue
-        updates.append({
-            "range": f"{PREDICTIONS_TAB}!F{row_num}:G{row_num}",
-            "values": [[detail["result"], detail["correct"]]],
-        })
-        matched += 1
-
-    if updates:
+        row = all_rows[row_num - 1]
+        row.extend([""] * (7 - len(row)))
+        row[5:7] = [detail["result"], detail["correct"]]
+        updated_rows.append(row_num)
+
+    if updated_rows:
+        # One F:G range per run of consecutive updated rows. Rows that weren't
+        # scored (e.g. SCRAPE_FAILED) are never rewritten, so formulas or
+        # manual edits in them survive.
+        updates = []
+        for row_num in sorted(set(updated_rows)):
+            if updates and row_num == updates[-1]["last"] + 1:
+                updates[-1]["last"] = row_num
+            else:
+                updates.append({"first": row_num, "last": row_num})
         service.spreadsheets().values().batchUpdate(
             spreadsheetId=SPREADSHEET_ID,
-            body={"valueInputOption": "RAW", "data": updates},
+            body={"valueInputOption": "RAW", "data": [
+                {
+                    "range": f"{PREDICTIONS_TAB}!F{run['first']}:G{run['last']}",
+                    "values": [all_rows[n - 1][5:7] for n in range(run["first"], run["last"] + 1)],
+                }
+                for run in updates
+            ]},
         ).execute()
-        print(f"Updated {matched} rows with results in '{PREDICTIONS_TAB}'")
+        print(f"Updated {len(updated_rows)} rows with results in '{PREDICTIONS_TAB}'")
     else:
         print("No rows updated — check that predictions were written this morning.")
 
-    # Re-fetch sheet to get latest data for leaderboard rebuild
-    fresh_rows = read_tab(service, PREDICTIONS_TAB)
-    rebuild_leaderboard(service, fresh_rows)
+    # all_rows already carries the new results, so no re-fetch is needed
+    rebuild_leaderboard(service, all_rows)
 
 
 # ---------------------------------------------------------------------------
@@ -336,58 +366,42 @@ def rebuild_leaderboard(service, all_rows):
     """
     sheet_id = get_or_create_tab(service, LEADERBOARD_TAB)
 
-    # Step 1: build per-(date, site) counters
-    counters = {}  # { (date, site): {"total": int, "correct": int} }
-    all_dates = set()
-
-    for i, row in enumerate(all_rows):
-        if i == 0:
-            continue  # skip header
+    # Step 1: one (date, site, scoreable, correct) entry per usable row
+    row_dates, row_sites, scoreable, correct = [], [], [], []
+    for row in all_rows[1:]:  # skip header
         if len(row) < 3:
             continue
-        run_date = row[0] if len(row) > 0 else ""
-        site = row[1] if len(row) > 1 else ""
-        home = row[2] if len(row) > 2 else ""
-        correct_val = row[6] if len(row) > 6 else ""
-
-        if not run_date or site not in SITES or home == "SCRAPE_FAILED":
+        run_date, site, home = row[0], row[1], row[2]
+        if not run_date or site not in SITE_INDEX or home == "SCRAPE_FAILED":
             continue
-
-        all_dates.add(run_date)
-        key = (run_date, site)
-        if key not in counters:
-            counters[key] = {"total": 0, "correct": 0}
-
-        if correct_val in ("Y", "N"):
-            counters[key]["total"] += 1
-            if correct_val == "Y":
-                counters[key]["correct"] += 1
-
-    sorted_dates = sorted(all_dates, reverse=True)  # newest first
-
-    # Step 2: build one data row per site
+        correct_val = row[6] if len(row) > 6 else ""
+        row_dates.append(run_date)
+        row_sites.append(SITE_INDEX[site])
+        scoreable.append(correct_val in ("Y", "N"))
+        correct.append(correct_val == "Y")
+
+    sorted_dates = sorted(set(row_dates), reverse=True)  # newest first
+
+    # Step 2: pivot into site × date count grids with one bincount each, then
+    # compute every day's win % and each site's average at once
+    date_index = {d: i for i, d in enumerate(sorted_dates)}
+    shape = (len(SITES), len(sorted_dates))
+    cells = np.array(row_sites, dtype=np.intp) * shape[1] + np.fromiter(
+        (date_index[d] for d in row_dates), dtype=np.intp, count=len(row_dates)
+    )
+    totals = np.bincount(cells, weights=scoreable, minlength=shape[0] * shape[1]).reshape(shape)
+    wins = np.bincount(cells, weights=correct, minlength=shape[0] * shape[1]).reshape(shape)
+
+    scored = totals > 0
+    pcts = np.divide(wins * 100, totals, out=np.zeros(shape), where=scored)
+    days_scored = scored.sum(axis=1)
+    avgs = pcts.sum(axis=1) / np.maximum(days_scored, 1)
+
+    # Layout: Site | Average | date_newest | date_next | ...
     data_rows = []
-    for site in SITES:
-        day_pcts = []
-        numeric_pcts = []
-
-        for d in sorted_dates:
-            c = counters.get((d, site), {"total": 0, "correct": 0})
-            if c["total"] > 0:
-                pct = c["correct"] / c["total"] * 100
-                cell = f"{pct:.0f}%"
-                numeric_pcts.append(pct)
-            else:
-                cell = "—"
-            day_pcts.append(cell)
-
-        if numeric_pcts:
-            avg = sum(numeric_pcts) / len(numeric_pcts)
-            avg_cell = f"{avg:.1f}%"
-        else:
-            avg_cell = "—"
-
-        # Layout: Site | Average | date_newest | date_next | ...
+    for i, site in enumerate(SITES):
+        avg_cell = f"{avgs[i]:.1f}%" if days_scored[i] else "—"
+        day_pcts = [f"{pct:.0f}%" if ok else "—" for pct, ok in zip(pcts[i], scored[i])]
         data_rows.append([site, avg_cell] + day_pcts)
 
     # Step 3: sort by average descending
@@ -399,66 +413,51 @@ def rebuild_leaderboard(service, all_rows):
 
     header = ["Site", "Average"] + sorted_dates
 
-    # Clear tab first to remove any stale columns from previous formats
-    service.spreadsheets().values().clear(
-        spreadsheetId=SPREADSHEET_ID,
-        range=f"{LEADERBOARD_TAB}!A:Z",
-    ).execute()
-
-    service.spreadsheets().values().update(
+    # Step 4: write values and per-site pastel row colours (same palette as
+    # Predictions tab) in one request. The range is open-ended, so every cell
+    # past the new table is cleared too, removing stale columns and colours
+    # from previous formats without a separate clear.
+    service.spreadsheets().batchUpdate(
         spreadsheetId=SPREADSHEET_ID,
-        range=f"{LEADERBOARD_TAB}!A1",
-        valueInputOption="RAW",
-        body={"values": [header] + data_rows},
+        body={"requests": [{
+            "updateCells": {
+                "range": {"sheetId": sheet_id, "startRowIndex": 0, "startColumnIndex": 0},
+                "rows": [row_data(header)] + [
+                    row_data(row, SITE_COLORS.get(row[0])) for row in data_rows
+                ],
+                "fields": "userEnteredValue,userEnteredFormat.backgroundColor",
+            }
+        }]},
     ).execute()
     print(f"Leaderboard rebuilt in '{LEADERBOARD_TAB}' ({len(sorted_dates)} day(s))")
 
-    # Step 4: apply per-site pastel row colours (same palette as Predictions tab)
-    num_cols = len(header)
-    color_requests = []
-    for row_idx, row in enumerate(data_rows):
-        site = row[0]
-        color = SITE_COLORS.get(site)
-        if not color:
-            continue
-        color_requests.append({
-            "repeatCell": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "startRowIndex": row_idx + 1,  # +1 to skip header
-                    "endRowIndex": row_idx + 2,
-                    "startColumnIndex": 0,
-                    "endColumnIndex": num_cols,
-                },
-                "cell": {"userEnteredFormat": {"backgroundColor": color}},
-                "fields": "userEnteredFormat.backgroundColor",
-            }
-        })
-    if color_requests:
-        service.spreadsheets().batchUpdate(
-            spreadsheetId=SPREADSHEET_ID,
-            body={"requests": color_requests},
-        ).execute()
-        print(f"  [color] Leaderboard colours applied for {len(color_requests)} row(s)")
-
 
 # ---------------------------------------------------------------------------
 # Entry point
 # ---------------------------------------------------------------------------
 
+def run(run_date, mode, service=None):
+    """
+    In-process entry point used by server.py. Returns a status dict.
+    Pass an already-built service to skip authentication.
+    """
+    print(f"update_sheet.py — mode={mode}, date={run_date}")
+    service = service or get_service()
+    _sheet_ids.clear()  # tabs may have been renamed or deleted since the last run
+
+    if mode == "predictions":
+        mode_predictions(service, run_date)
+    elif mode == "results":
+        mode_results(service, run_date)
+    return {"status": "ok", "error": None}
+
+
 def main():
     parser = argparse.ArgumentParser(description="Write predictions/results to Google Sheet")
     parser.add_argument("--mode", choices=["predictions", "results"], required=True)
     parser.add_argument("--date", default=str(date.today()), help="Date in YYYY-MM-DD format")
     args = parser.parse_args()
-
-    print(f"update_sheet.py — mode={args.mode}, date={args.date}")
-    service = get_service()
-
-    if args.mode == "predictions":
-        mode_predictions(service, args.date)
-    elif args.mode == "results":
-        mode_results(service, args.date)
+    run(args.date, args.mode)
 
 
 if __name__ == "__main__":